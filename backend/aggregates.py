@@ -0,0 +1,405 @@
+"""
+Materialized spending aggregates
+
+Keeps running daily, monthly and per-category totals (in cents) and counts
+for each user, plus each category's daily totals for category forecasts. Appending a batch of transactions folds only that batch into
+the totals, and removing rows (deletions, dedupe corrections) subtracts them
+again, so summaries and forecaster input never rescan the full history.
+
+Per-day counts of amounts already counted let a statement that overlaps
+earlier uploads be merged without counting its shared rows twice (a
+(day, amount) already counted is a duplicate, as in prepare_data). The store
+appends each batch to a per-user log rather than rewriting the saved
+aggregates, and folds the log into them every COMPACT_EVERY batches.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from transactions import TransactionTable, day_ordinals_to_dates
+
+
+COMPACT_EVERY = 50  # Logged batches before a user's aggregates are rewritten
+
+
+class DenseSeries:
+    """
+    Totals and counts over a contiguous range of integer keys (days or months)
+    """
+    def __init__(self, start=None, cents=None, counts=None):
+        self.start = start
+        self.cents = np.asarray(cents if cents is not None else [], dtype=np.int64)
+        self.counts = np.asarray(counts if counts is not None else [], dtype=np.int64)
+
+    def fold(self, start, cents, counts):
+        """
+        Add another dense range into this one, widening the range if needed
+        """
+        if len(cents) == 0:
+            return
+        if self.start is None:
+            self.start = start
+            self.cents = cents.copy()
+            self.counts = counts.copy()
+            return
+
+        new_start = min(self.start, start)
+        new_stop = max(self.start + len(self.cents), start + len(cents))
+        if new_start != self.start or new_stop != self.start + len(self.cents):
+            offset = self.start - new_start
+            grown_cents = np.zeros(new_stop - new_start, dtype=np.int64)
+            grown_counts = np.zeros(new_stop - new_start, dtype=np.int64)
+            grown_cents[offset:offset + len(self.cents)] = self.cents
+            grown_counts[offset:offset + len(self.counts)] = self.counts
+            self.start, self.cents, self.counts = new_start, grown_cents, grown_counts
+
+        offset = start - self.start
+        self.cents[offset:offset + len(cents)] += cents
+        self.counts[offset:offset + len(counts)] += counts
+
+    def active_range(self):
+        """
+        (first, stop) offsets of the span that still has transactions
+        """
+        active = np.flatnonzero(self.counts > 0)
+        if len(active) == 0:
+            return 0, 0
+        return int(active[0]), int(active[-1]) + 1
+
+
+class SpendingAggregates:
+    """
+    Daily, monthly and per-category rollups for one user's spending
+    """
+    def __init__(self, keep_rows=True):
+        self.daily = DenseSeries()
+        self.monthly = DenseSeries()
+        self.category_slots = {}
+        self.category_cents = np.zeros(0, dtype=np.int64)
+        self.category_counts = np.zeros(0, dtype=np.int64)
+        self.category_daily = []  # category slot -> DenseSeries of that category's days
+        self.keep_rows = keep_rows
+        self.row_counts = {}  # day ordinal -> {cents: rows}, only with keep_rows
+
+    def merge(self, table):
+        """
+        Fold in a statement that may overlap rows added earlier, returning the rows that were new
+
+        As in ingest.merge_statements and FinanceForecaster.prepare_data, a
+        (day, amount) is counted once: repeats inside the batch and rows whose
+        (day, amount) is already counted are dropped.
+        """
+        table = table.without_payments().drop_duplicates()
+        new_rows = table.take(~self._counted(table))
+        self.add(new_rows)
+        return new_rows
+
+    def _counted(self, table):
+        """
+        Mask of rows whose (day, cents) is already counted
+        """
+        return np.array([cents in self.row_counts.get(day, ())
+                         for day, cents in zip(table.days.tolist(), table.cents.tolist())], dtype=bool)
+
+    def add(self, table):
+        """
+        Fold a batch of transactions into the totals
+        """
+        self._apply(table, 1)
+
+    def remove(self, table):
+        """
+        Subtract previously added transactions (deleted rows or duplicates found later)
+        """
+        self._apply(table, -1)
+
+    def _apply(self, table, sign):
+        # Payments aren't spending, same as FinanceForecaster.prepare_data
+        table = table.without_payments()
+        if len(table) == 0:
+            return
+
+        first_day, cents, counts = table.daily_totals()
+        self.daily.fold(first_day, sign * cents, sign * counts)
+
+        first_month, cents, counts = table.monthly_totals()
+        self.monthly.fold(first_month, sign * cents, sign * counts)
+
+        # Map the batch's category dictionary onto this user's category slots
+        for name in table.categories:
+            if name not in self.category_slots:
+                self.category_slots[name] = len(self.category_slots)
+        slots = np.array([self.category_slots[name] for name in table.categories], dtype=np.int64)
+        size = len(self.category_slots)
+        if len(self.category_cents) < size:
+            self.category_cents = np.pad(self.category_cents, (0, size - len(self.category_cents)))
+            self.category_counts = np.pad(self.category_counts, (0, size - len(self.category_counts)))
+
+        row_slots = slots[table.category_codes]
+        batch_cents = np.rint(np.bincount(row_slots, weights=table.cents, minlength=size))
+        batch_counts = np.bincount(row_slots, minlength=size)
+        self.category_cents += sign * batch_cents.astype(np.int64)
+        self.category_counts += sign * batch_counts.astype(np.int64)
+
+        # Each category's daily totals, one fold per category in the batch
+        self.category_daily.extend(DenseSeries() for _ in range(size - len(self.category_daily)))
+        order = np.argsort(row_slots, kind='stable')
+        for rows in np.split(order, np.flatnonzero(np.diff(row_slots[order])) + 1):
+            first_day, cents, counts = table.take(rows).daily_totals()
+            self.category_daily[row_slots[rows[0]]].fold(first_day, sign * cents, sign * counts)
+
+        if self.keep_rows:
+            keys = np.column_stack([table.days, table.cents]).astype(np.int64)
+            keys, counts = np.unique(keys, axis=0, return_counts=True)
+            for (day, cents), count in zip(keys.tolist(), counts.tolist()):
+                day_rows = self.row_counts.setdefault(day, {})
+                remaining = day_rows.get(cents, 0) + sign * count
+                if remaining > 0:
+                    day_rows[cents] = remaining
+                else:
+                    day_rows.pop(cents, None)
+                    if not day_rows:
+                        del self.row_counts[day]
+
+    def category_daily_matrix(self):
+        """
+        Daily spending per category over the active history, as category_forecast.category_daily_matrix
+
+        Returns:
+            (first day ordinal, category names, (categories, days) array of dollars)
+        """
+        first, stop = self.daily.active_range()
+        names = [name for name, slot in self.category_slots.items() if self.category_cents[slot] > 0]
+        if stop == first or not names:
+            return 0, [], np.zeros((0, 0))
+
+        start = (self.daily.start or 0) + first
+        matrix = np.zeros((len(names), stop - first))
+        for row, name in zip(matrix, names):
+            series = self.category_daily[self.category_slots[name]]
+            if series.start is None:
+                continue
+            lo = max(series.start, start)
+            hi = min(series.start + len(series.cents), start + len(row))
+            if hi > lo:
+                row[lo - start:hi - start] = series.cents[lo - series.start:hi - series.start] / 100
+        return start, names, matrix
+
+    def category_day_table(self):
+        """
+        One row per (category, day) with that day's total, as a day-sorted TransactionTable
+
+        Enough for anything that only sums by day and category, like seeding
+        budget rule state, without keeping the individual rows.
+        """
+        days, cents, slots = [], [], []
+        for slot, series in enumerate(self.category_daily):
+            active = np.flatnonzero(series.counts > 0)
+            days.append(series.start + active if len(active) else active)
+            cents.append(series.cents[active])
+            slots.append(np.full(len(active), slot))
+        if not days:
+            return TransactionTable([], [], [], ['other'])
+        table = TransactionTable(np.concatenate(cents), np.concatenate(days), np.concatenate(slots),
+                                 list(self.category_slots))
+        return table.sort_by_day()
+
+    def category_shares(self):
+        """
+        Each category's share of spending, as scenarios.category_shares
+        """
+        names = list(self.category_slots)
+        totals = pd.Series(self.category_cents[:len(names)], index=names, dtype=float)
+        totals = totals[self.category_counts[:len(names)] > 0]
+        if totals.sum() <= 0:
+            return pd.Series(dtype=float)
+        return totals / totals.sum()
+
+    def fingerprint(self):
+        """
+        Hash of the daily and per-category totals, which is all a forecast reads
+        """
+        first, stop = self.daily.active_range()
+        sha = hashlib.sha256()
+        sha.update(str((self.daily.start or 0) + first).encode())
+        sha.update(self.daily.cents[first:stop].tobytes())
+        sha.update(json.dumps(self.category_summary(), sort_keys=True).encode())
+        return sha.hexdigest()
+
+    def to_prophet_df(self):
+        """
+        Prophet 'ds'/'y' frame, matching FinanceForecaster.prepare_data
+        """
+        first, stop = self.daily.active_range()
+        days = np.arange(self.daily.start or 0, (self.daily.start or 0) + len(self.daily.cents))[first:stop]
+        return pd.DataFrame({
+            'ds': day_ordinals_to_dates(days),
+            'y': self.daily.cents[first:stop] / 100
+        })
+
+    def monthly_summary(self):
+        """
+        Spending and transaction count per calendar month
+        """
+        first, stop = self.monthly.active_range()
+        months = np.arange(self.monthly.start or 0, (self.monthly.start or 0) + len(self.monthly.cents))[first:stop]
+        return pd.DataFrame({
+            'month': months.astype('datetime64[M]').astype('datetime64[ns]'),
+            'total': self.monthly.cents[first:stop] / 100,
+            'count': self.monthly.counts[first:stop]
+        })
+
+    def category_summary(self):
+        """
+        Per-category totals in the same shape as the 'categories' forecast output
+        """
+        summary = {}
+        for name, slot in self.category_slots.items():
+            count = int(self.category_counts[slot])
+            if count <= 0:
+                continue
+            cents = int(self.category_cents[slot])
+            summary[name] = {
+                'total': cents / 100,
+                'count': count,
+                'avg_per_transaction': round(cents / count / 100, 2)
+            }
+        return summary
+
+    def to_dict(self):
+        return {
+            'daily': {'start': self.daily.start, 'cents': self.daily.cents.tolist(), 'counts': self.daily.counts.tolist()},
+            'monthly': {'start': self.monthly.start, 'cents': self.monthly.cents.tolist(), 'counts': self.monthly.counts.tolist()},
+            'categories': list(self.category_slots),
+            'category_cents': self.category_cents.tolist(),
+            'category_counts': self.category_counts.tolist(),
+            'category_daily': [{'start': series.start, 'cents': series.cents.tolist(), 'counts': series.counts.tolist()}
+                               for series in self.category_daily],
+            'rows': [[day, cents, count] for day, day_rows in self.row_counts.items()
+                     for cents, count in day_rows.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        for row in data.get('rows', []):
+            # Rows saved before category_daily also carried a category slot: [day, cents, slot, count]
+            day_rows = aggregates.row_counts.setdefault(row[0], {})
+            day_rows[row[1]] = day_rows.get(row[1], 0) + row[-1]
+        aggregates.daily = DenseSeries(**data['daily'])
+        aggregates.monthly = DenseSeries(**data['monthly'])
+        aggregates.category_slots = {name: i for i, name in enumerate(data['categories'])}
+        aggregates.category_cents = np.asarray(data['category_cents'], dtype=np.int64)
+        aggregates.category_counts = np.asarray(data['category_counts'], dtype=np.int64)
+        if 'category_daily' in data:
+            aggregates.category_daily = [DenseSeries(**series) for series in data['category_daily']]
+        else:
+            aggregates.category_daily = [DenseSeries() for _ in aggregates.category_slots]
+            legacy = np.array([row for row in data.get('rows', []) if len(row) == 4], dtype=np.int64)
+            if len(legacy):
+                rows = TransactionTable(np.repeat(legacy[:, 1], legacy[:, 3]), np.repeat(legacy[:, 0], legacy[:, 3]),
+                                        np.repeat(legacy[:, 2], legacy[:, 3]), data['categories'])
+                for slot in range(len(aggregates.category_slots)):
+                    first_day, cents, counts = rows.take(rows.category_codes == slot).daily_totals()
+                    aggregates.category_daily[slot].fold(first_day, cents, counts)
+        return aggregates
+
+
+class AggregateStore:
+    """
+    Per-user aggregates, cached in memory and saved as JSON next to the user database
+
+    Batches are appended to a per-user log (<user>.jsonl) so saving one costs
+    O(batch); the log is replayed on load and folded into <user>.json every
+    COMPACT_EVERY batches.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.cache = {}
+        self.log_lengths = {}
+
+    def _base(self, user):
+        safe_name = ''.join(c if c.isalnum() or c in '@._-' else '_' for c in user)
+        return os.path.join(self.directory, safe_name)
+
+    def _load(self, base):
+        """
+        Saved aggregates plus replayed log for one user, and the log's length
+        """
+        aggregates = SpendingAggregates()
+        if os.path.exists(base + '.json'):
+            with open(base + '.json', 'r') as f:
+                aggregates = SpendingAggregates.from_dict(json.load(f))
+
+        log_length = 0
+        if os.path.exists(base + '.jsonl'):
+            with open(base + '.jsonl', 'r') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    table = TransactionTable(entry['cents'], entry['days'], entry['codes'], entry['categories'])
+                    getattr(aggregates, entry['op'])(table)
+                    log_length += 1
+        return aggregates, log_length
+
+    def get(self, user):
+        if user not in self.cache:
+            self.cache[user], self.log_lengths[user] = self._load(self._base(user))
+        return self.cache[user]
+
+    def stored(self):
+        """
+        Aggregates of every user with saved data (e.g. for cohort training)
+        """
+        if not os.path.isdir(self.directory):
+            return
+        bases = {os.path.splitext(name)[0] for name in os.listdir(self.directory)
+                 if name.endswith(('.json', '.jsonl'))}
+        for base in sorted(bases):
+            yield self._load(os.path.join(self.directory, base))[0]
+
+    def save(self, user):
+        """
+        Rewrite the user's aggregates and clear their log
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        base = self._base(user)
+        with open(base + '.json.tmp', 'w') as f:
+            json.dump(self.get(user).to_dict(), f)
+        os.replace(base + '.json.tmp', base + '.json')
+        if os.path.exists(base + '.jsonl'):
+            os.remove(base + '.jsonl')
+        self.log_lengths[user] = 0
+
+    def _log(self, user, op, table):
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {
+            'op': op,
+            'cents': table.cents.tolist(),
+            'days': table.days.tolist(),
+            'codes': table.category_codes.tolist(),
+            'categories': list(table.categories)
+        }
+        with open(self._base(user) + '.jsonl', 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        self.log_lengths[user] += 1
+        if self.log_lengths[user] >= COMPACT_EVERY:
+            self.save(user)
+
+    def merge(self, user, table):
+        """
+        Fold a batch that may overlap earlier uploads into the user's aggregates
+
+        Returns:
+            TransactionTable of the rows that weren't counted before
+        """
+        table = table.without_payments()
+        new_rows = self.get(user).merge(table)
+        self._log(user, 'merge', table)
+        return new_rows
+
+    def remove(self, user, table):
+        self.get(user).remove(table)
+        self._log(user, 'remove', table)
@@ -1,13 +1,40 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
+from functools import wraps
 import json
 import os
+import secrets
 from flask_cors import CORS
+from ingest import parse_statement_files, merge_statements, run_forecast, save_frontend_json
+from aggregates import AggregateStore
+from scenarios import ScenarioEngine
+from upload_store import UploadStore
+from sessions import SessionManager
+from budget_rules import BudgetRuleEngine
 
 app = Flask(__name__)
 CORS(app)
 
 DB_FILE = os.path.join(os.path.dirname(__file__), "database", "db_users.json")
 
+# Old clients identified themselves with an 'email' field instead of a session token.
+# That lets anyone act as any user, so it stays off unless explicitly enabled.
+ALLOW_EMAIL_AUTH = os.environ.get("SMARTSPEND_ALLOW_EMAIL_AUTH") == "1"
+
+# Latest forecast's scenario engine per user, so what-if queries don't refit
+scenario_engines = {}
+
+# Running daily/monthly/category totals per user
+aggregate_store = AggregateStore(os.path.join(os.path.dirname(__file__), "database", "aggregates"))
+
+# Content-addressed statement uploads and cached results
+upload_store = UploadStore(os.path.join(os.path.dirname(__file__), "database", "uploads"))
+
+# Budget rules, checked incrementally as statements are ingested
+# (window state is rebuilt from the stored aggregates, since known statements aren't re-ingested)
+budget_engine = BudgetRuleEngine(os.path.join(os.path.dirname(__file__), "database", "budget_rules.json"),
+                                 alerts_file=os.path.join(os.path.dirname(__file__), "database", "budget_alerts.json"),
+                                 history=lambda user: aggregate_store.get(user).category_day_table())
+
 
 # Helper Function to load JSON File 
 
@@ -22,6 +49,14 @@ def save_users(data):
     with open(DB_FILE, "w") as f:
         json.dump(data, f, indent=4)
 
+
+# Signed session tokens; without a configured key, sessions last until restart
+sessions = SessionManager(
+    os.environ.get("SMARTSPEND_SECRET_KEY") or secrets.token_hex(32),
+    generations={u["email"]: u.get("session_generation", 0) for u in load_users()["users"]},
+    revoked_file=os.path.join(os.path.dirname(__file__), "database", "revoked_sessions.json")
+)
+
 #Endpoint ot add a new user 
 
 @app.route("/add_user", methods=["POST"])
@@ -65,7 +100,7 @@ def login():
     users_data = load_users()
     for u in users_data["users"]:
         if u["email"] == email and u["password"] == password:
-            return jsonify({"message": "Login successful"}), 200
+            return jsonify({"message": "Login successful", "token": sessions.issue(email)}), 200
         
 
     return jsonify({"error": "Invalid email or password"}), 401
@@ -92,6 +127,8 @@ def forgot_password():
     for u in users_list:
         if u["email"] == email:
             u["password"] = new_password  # Update password
+            # Old sessions shouldn't survive a password change (or a restart after one)
+            u["session_generation"] = sessions.revoke_user(email)
             user_found = True
             break
 
@@ -104,7 +141,49 @@ def forgot_password():
     return jsonify({"message": "Password updated successfully"}), 200
 
 
+def bearer_token():
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[len("Bearer "):].strip()
+    return None
+
+
+def with_user(view):
+    """
+    Resolve the request's user into g.user
+
+    A bearer token is required and validated without touching the user
+    store. With ALLOW_EMAIL_AUTH, requests without one fall back to an
+    'email' field, as the client sent before sessions existed.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = bearer_token()
+        if token is not None:
+            g.user = sessions.validate(token)
+            if g.user is None:
+                return jsonify({"error": "Invalid or expired session"}), 401
+        elif ALLOW_EMAIL_AUTH:
+            data = request.get_json(silent=True) or {}
+            g.user = request.values.get("email") or data.get("email") or "anonymous"
+        else:
+            return jsonify({"error": "Missing session token"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route("/logout", methods=["POST"])
+def logout():
+    token = bearer_token()
+    if token is None:
+        return jsonify({"error": "Missing session token"}), 400
+
+    sessions.revoke(token)
+    return jsonify({"message": "Logged out"}), 200
+
+
 @app.route('/upload', methods=['POST'])
+@with_user
 def upload_files():
     if 'files' not in request.files:
         return jsonify({'error': 'No files found in request'}), 400
@@ -114,10 +193,145 @@ def upload_files():
     if not uploaded_files:
         return jsonify({'error': 'No files uploaded'}), 400
 
+    try:
+        monthly_income = float(request.form.get('monthly_income', 3500))
+    except ValueError:
+        return jsonify({'error': 'monthly_income must be a number'}), 400
+
+    user = g.user
+    manifest = upload_store.manifest(user)
+
+    # Hash and store each file as it streams in; identical files are stored once
+    saved = []
     for file in uploaded_files:
         print(f"Received: {file.filename}")
+        digest, path = upload_store.save_stream(file.stream)
+        saved.append((digest, path, file.filename or digest))
+
+    # Row counts for this exact set of files, saved the first time it was parsed
+    files_key = upload_store.batch_key([digest for digest, _, _ in saved])
+    batch = upload_store.load_result(files_key)
+
+    # Byte-identical re-upload of statements this user already ingested: their history is unchanged
+    new_rows = None
+    fingerprint = manifest.get('history')
+    if batch is None or fingerprint is None or not all(digest in manifest['statements'] for digest, _, _ in saved):
+        # Parse all files concurrently and merge them
+        try:
+            tables = parse_statement_files([(path, filename) for _, path, filename in saved])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        table = merge_statements(tables)
+
+        if len(table) == 0:
+            return jsonify({'error': 'No transactions found in uploaded files'}), 400
+
+        batch = {
+            'transactions': len(table),
+            'duplicates_removed': sum(len(file_table) for file_table in tables) - len(table)
+        }
+        upload_store.save_result([files_key], batch)
+
+        # Statements this user hasn't ingested before are folded into their running totals,
+        # minus rows they share with earlier uploads (overlapping exports)
+        file_rows = [upload_store.rows_key(file_table) for file_table in tables]
+        new_tables = [file_table for file_table, rows, (digest, _, _) in zip(tables, file_rows, saved)
+                      if not upload_store.is_known(manifest, digest, rows)]
+        if new_tables:
+            new_rows = aggregate_store.merge(user, merge_statements(new_tables))
+        if new_tables or fingerprint is None:
+            fingerprint = aggregate_store.get(user).fingerprint()
+        upload_store.record_statements(user, [(digest, rows, filename)
+                                              for rows, (digest, _, filename) in zip(file_rows, saved)],
+                                       fingerprint=fingerprint)
+
+    # The forecast covers the user's whole history: reuse it if that history was forecast before
+    history_key = upload_store.history_key(fingerprint, monthly_income)
+    record = upload_store.load_result(history_key)
+    cached = record is not None
+    if cached:
+        scenario_engines[user] = ScenarioEngine.from_result(record['result'], monthly_income)
+        save_frontend_json(record['result'])
+    else:
+        result, engine = run_forecast(aggregate_store.get(user), monthly_income=monthly_income)
+        scenario_engines[user] = engine
+        record = {'result': result}
+        upload_store.save_result([history_key], record)
+
+    # Check budget rules against the forecast that includes these rows
+    budget_engine.set_daily_forecast(user, record['result']['summary']['total_predicted_spending_1yr'] / 365)
+    alerts = budget_engine.process_table(user, new_rows) if new_rows is not None else []
+
+    return jsonify({
+        'status': 'success',
+        'message': f'{len(uploaded_files)} file(s) received!',
+        'transactions': batch['transactions'],
+        'duplicates_removed': batch['duplicates_removed'],
+        'cached': cached,
+        'summary': record['result']['summary'],
+        'alerts': alerts
+    })
+
+@app.route('/summary', methods=['GET'])
+@with_user
+def spending_summary():
+    aggregates = aggregate_store.get(g.user)
+    monthly = aggregates.monthly_summary()
+
+    return jsonify({
+        'monthly': {
+            'months': monthly['month'].dt.strftime('%Y-%m').tolist(),
+            'totals': monthly['total'].tolist(),
+            'counts': monthly['count'].tolist()
+        },
+        'categories': aggregates.category_summary()
+    }), 200
+
+
+@app.route('/budget_rules', methods=['GET', 'POST'])
+@with_user
+def budget_rules():
+    if request.method == 'GET':
+        return jsonify({'rules': budget_engine.user_rules(g.user)}), 200
+
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "Missing JSON data"}), 400
+
+    try:
+        rule = budget_engine.add_rule(
+            g.user,
+            data.get('type'),
+            data.get('limit', 0),
+            category=data.get('category'),
+            days=data.get('days', 7)
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({'rule': rule}), 201
+
+
+@app.route('/what_if', methods=['POST'])
+@with_user
+def what_if():
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "Missing JSON data"}), 400
+
+    engine = scenario_engines.get(g.user)
+    if engine is None:
+        return jsonify({"error": "No forecast available, upload statements first"}), 404
+
+    scenarios = data.get("scenarios") or [data]
+    try:
+        results = engine.evaluate(scenarios)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid scenario: {e}"}), 400
+    except (TypeError, AttributeError):
+        return jsonify({"error": "Invalid scenario"}), 400
 
-    return jsonify({'status': 'success', 'message': f'{len(uploaded_files)} file(s) received!'})
+    return jsonify({"scenarios": results}), 200
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=3000, debug=True)
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Backtesting harness for forecaster settings
+
+Runs rolling-origin cross-validation over many spending histories and config
+candidates in a process pool. Each fold trains on everything up to a month
+end and predicts the following calendar month, which is what the dashboard
+shows. The report puts accuracy (MAE/MAPE of monthly totals) next to fit and
+predict time so we can pick the cheapest config that meets an accuracy target.
+"""
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from finance_forecaster import FinanceForecaster, DEFAULT_CONFIG
+
+
+CANDIDATE_CONFIGS = {
+    'default': DEFAULT_CONFIG,
+    'additive': {**DEFAULT_CONFIG, 'seasonality_mode': 'additive'},
+    'smooth': {**DEFAULT_CONFIG, 'changepoint_prior_scale': 0.05, 'seasonality_prior_scale': 10},
+    'no_yearly': {**DEFAULT_CONFIG, 'yearly_seasonality': False, 'monthly_fourier_order': 3},
+    'lean': {**DEFAULT_CONFIG, 'yearly_seasonality': False, 'monthly_fourier_order': 3,
+             'changepoint_prior_scale': 0.05, 'uncertainty_samples': 200},
+}
+
+
+def rolling_origins(prophet_df, n_folds=3, min_train_days=60):
+    """
+    Month-end cutoffs for the last n_folds complete months that leave enough history to train on
+    """
+    first_day = prophet_df['ds'].min()
+    last_day = prophet_df['ds'].max()
+
+    # A fold needs the whole following month in the data
+    month_ends = pd.date_range(first_day, last_day, freq='M')
+    cutoffs = [cutoff for cutoff in month_ends
+               if (cutoff - first_day).days + 1 >= min_train_days
+               and cutoff + pd.offsets.MonthEnd(1) <= last_day]
+    return cutoffs[-n_folds:]
+
+
+def evaluate_fold(history_name, prophet_df, config_name, config, cutoff):
+    """
+    Train on data up to cutoff and score the next calendar month's total
+    """
+    # cmdstanpy logs every fit at INFO (and resets its level on first use)
+    logging.getLogger('cmdstanpy').disabled = True
+
+    train = prophet_df[prophet_df['ds'] <= cutoff]
+    month_end = cutoff + pd.offsets.MonthEnd(1)
+    actual = prophet_df[(prophet_df['ds'] > cutoff) & (prophet_df['ds'] <= month_end)]['y'].sum()
+
+    forecaster = FinanceForecaster(config, verbose=False)
+
+    start = time.perf_counter()
+    forecaster.fit(train)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    forecast = forecaster.predict(periods=(month_end - cutoff).days)
+    predict_seconds = time.perf_counter() - start
+
+    predicted = forecast[forecast['ds'] > cutoff]['yhat'].sum()
+
+    return {
+        'history': history_name,
+        'config': config_name,
+        'cutoff': cutoff,
+        'actual': actual,
+        'predicted': predicted,
+        'abs_error': abs(predicted - actual),
+        'pct_error': abs(predicted - actual) / actual * 100 if actual > 0 else np.nan,
+        'fit_seconds': fit_seconds,
+        'predict_seconds': predict_seconds
+    }
+
+
+def run_backtest(histories, configs=None, n_folds=3, min_train_days=60, max_workers=None):
+    """
+    Cross-validate every config on every history in parallel
+
+    Args:
+        histories: dict of name -> Prophet 'ds'/'y' DataFrame (FinanceForecaster.prepare_data output)
+        configs: dict of name -> forecaster config (defaults to CANDIDATE_CONFIGS)
+        n_folds: Rolling origins per history
+        min_train_days: Minimum history before the first cutoff
+        max_workers: Worker processes (defaults to one per CPU)
+
+    Returns:
+        (per-config report DataFrame, per-fold results DataFrame)
+    """
+    configs = configs or CANDIDATE_CONFIGS
+
+    tasks = []
+    for history_name, prophet_df in histories.items():
+        for cutoff in rolling_origins(prophet_df, n_folds, min_train_days):
+            for config_name, config in configs.items():
+                tasks.append((history_name, prophet_df, config_name, config, cutoff))
+
+    if not tasks:
+        raise ValueError("No history is long enough to backtest")
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        futures = [pool.submit(evaluate_fold, *task) for task in tasks]
+        folds = pd.DataFrame([f.result() for f in futures])
+
+    report = folds.groupby('config').agg(
+        mae=('abs_error', 'mean'),
+        mape=('pct_error', 'mean'),
+        fit_seconds=('fit_seconds', 'mean'),
+        predict_seconds=('predict_seconds', 'mean'),
+        folds=('cutoff', 'count')
+    )
+    report['total_seconds'] = report['fit_seconds'] + report['predict_seconds']
+    return report.sort_values('total_seconds'), folds
+
+
+def choose_config(report, mape_target):
+    """
+    Cheapest config whose MAPE meets the target, or the most accurate one if none does
+    """
+    meeting = report[report['mape'] <= mape_target]
+    if not meeting.empty:
+        return meeting['total_seconds'].idxmin()
+    return report['mape'].idxmin()
+
+
+if __name__ == "__main__":
+    from convert import load_and_process_csv
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    csv_paths = sys.argv[1:] or [
+        os.path.join(script_dir, 'UserInputTest', f)
+        for f in sorted(os.listdir(os.path.join(script_dir, 'UserInputTest')))
+        if f.endswith('.csv')
+    ]
+
+    histories = {}
+    for path in csv_paths:
+        df = load_and_process_csv(path)
+        histories[os.path.basename(path)] = FinanceForecaster(verbose=False).prepare_data(df)
+
+    report, folds = run_backtest(histories)
+
+    print("\n" + "=" * 60)
+    print("BACKTEST RESULTS")
+    print("=" * 60)
+    print(report.round(3).to_string())
+
+    mape_target = 25
+    print(f"\n✓ Cheapest config within {mape_target}% MAPE: {choose_config(report, mape_target)}")
@@ -0,0 +1,370 @@
+"""
+Incremental budget rule evaluation
+
+Users define budget rules:
+    monthly_cap         spending in a calendar month above limit
+    rolling_limit       spending over the last `days` days above limit
+    forecast_overshoot  month-to-date plus projected rest of month above limit
+
+Each rule watches all spending or categories containing a pattern
+(case-insensitive, like the PAYMENT filter). The engine keeps running
+month totals and recent day buckets per (user, pattern), so an ingested
+batch only updates the keys it touches and only re-checks the rules on
+those keys, however long the history is. A batch is checked as if its days
+had arrived one at a time: every month it touches, and the rolling window
+ending at each of its days, so a statement crossing a month boundary still
+alerts for the earlier month.
+
+Window state is rebuilt from the user's stored history (their aggregated
+rows) when the engine starts or a rule adds a new watch, and the period each
+rule last alerted for is saved, so a restart neither loses spending nor
+repeats alerts.
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from transactions import to_cents, to_day_ordinals, day_ordinals_to_months
+
+
+RULE_TYPES = ('monthly_cap', 'rolling_limit', 'forecast_overshoot')
+ALL_SPENDING = '*'
+
+
+@lru_cache(maxsize=None)
+def month_start_day(month_ordinal):
+    """
+    Day ordinal of the first day of a month ordinal
+    """
+    return int(np.datetime64(month_ordinal, 'M').astype('datetime64[D]').astype(np.int64))
+
+
+class WatchState:
+    """
+    Running totals for one (user, pattern)
+    """
+    def __init__(self):
+        self.month_cents = defaultdict(int)  # month ordinal -> cents
+        self.day_cents = defaultdict(int)  # day ordinal -> cents, complete from kept_from on
+        self.kept_from = None  # earlier day buckets were pruned (None: nothing pruned yet)
+        self.latest_day = None
+        self.checked_through = None  # latest day when the state was last pruned
+
+    def add(self, day, month, cents):
+        self.month_cents[month] += cents
+        if self.kept_from is None or day >= self.kept_from:
+            self.day_cents[day] += cents
+        if self.latest_day is None or day > self.latest_day:
+            self.latest_day = day
+
+    def prune(self, keep_days):
+        self.checked_through = self.latest_day
+        cutoff = self.latest_day - keep_days + 1
+        if self.kept_from is None or cutoff > self.kept_from:
+            for day in [d for d in self.day_cents if d < cutoff]:
+                del self.day_cents[day]
+            self.kept_from = cutoff
+
+    def window_totals(self, days, first_day):
+        """
+        Spending over the `days` days ending at each day where the window changes,
+        from first_day (or the day after the last check, if earlier) on
+
+        That's every bucket day (spending enters) and every day a bucket falls
+        out of the window, up to the latest day. Windows reaching back past
+        the pruned buckets are skipped. Returns (end days, totals in cents).
+        """
+        bucket_days = np.array(sorted(self.day_cents), dtype=np.int64)
+        cumulative = np.concatenate([[0], np.cumsum([self.day_cents[day] for day in bucket_days])])
+        ends = np.union1d(bucket_days, bucket_days + days)
+        if self.checked_through is not None:
+            first_day = min(first_day, self.checked_through + 1)
+        ends = ends[(ends >= first_day) & (ends <= self.latest_day)]
+        if self.kept_from is not None:
+            ends = ends[ends - days + 1 >= self.kept_from]
+        totals = (cumulative[np.searchsorted(bucket_days, ends, side='right')]
+                  - cumulative[np.searchsorted(bucket_days, ends - days, side='right')])
+        return ends, totals
+
+
+class BudgetRuleEngine:
+    """
+    Budget rules and their running window state, indexed by user and pattern
+    """
+    def __init__(self, rules_file=None, alerts_file=None, history=None):
+        """
+        Args:
+            rules_file: JSON file rules are saved in
+            alerts_file: JSON file the period each rule last alerted for is saved in
+            history: Function of a user returning a TransactionTable of their
+                already ingested spending (per category and day totals are enough),
+                used to seed window state
+        """
+        self.rules_file = rules_file
+        self.alerts_file = alerts_file
+        self.history = history
+        self.rules = {}  # rule id -> rule
+        self.rules_by_watch = defaultdict(list)  # (user, pattern) -> rule ids
+        self.patterns_by_user = defaultdict(set)
+        self.state = {}  # (user, pattern) -> WatchState
+        self.keep_days = defaultdict(lambda: 1)  # (user, pattern) -> longest rolling window
+        self.match_cache = defaultdict(dict)  # user -> category -> patterns matching it
+        self.breached = {}  # rule id -> months alerted for, or 'over' for a rolling rule over its limit
+        self.breached_changed = False
+        self.daily_forecast = {}  # (user, pattern) -> forecast spending per day ($)
+        self.lock = threading.Lock()
+        self.next_id = 1
+
+        if rules_file and os.path.exists(rules_file):
+            stale = defaultdict(set)
+            with open(rules_file, 'r') as f:
+                for rule in json.load(f)['rules']:
+                    if self._register(rule):
+                        stale[rule['user']].add((rule['user'], rule['category']))
+            for user, watches in stale.items():
+                self._seed(user, watches)
+
+        if alerts_file and os.path.exists(alerts_file):
+            with open(alerts_file, 'r') as f:
+                self.breached = {int(rule_id): period for rule_id, period in json.load(f).items()}
+
+    def _register(self, rule):
+        """
+        Index a rule, returning True if its watch needs (re)seeding from history
+
+        That's a new watch, or a rolling window longer than the day buckets it kept.
+        """
+        watch = (rule['user'], rule['category'])
+        stale = watch not in self.state
+        self.rules[rule['id']] = rule
+        self.rules_by_watch[watch].append(rule['id'])
+        self.patterns_by_user[rule['user']].add(rule['category'])
+        if rule['type'] == 'rolling_limit' and rule['days'] > self.keep_days[watch]:
+            self.keep_days[watch] = rule['days']
+            stale = True
+        if stale:
+            self.state[watch] = WatchState()
+        self.match_cache.pop(rule['user'], None)
+        self.next_id = max(self.next_id, rule['id'] + 1)
+        return stale
+
+    def _seed(self, user, watches):
+        """
+        Fold a user's stored history into fresh watches, without checking rules
+        """
+        if self.history is None:
+            return
+        table = self.history(user)
+        if len(table) == 0:
+            return
+        for watch in self._fold(self._table_batch(user, table), watches):
+            self.state[watch].prune(self.keep_days[watch])
+
+    def _save(self):
+        if self.rules_file:
+            with open(self.rules_file, 'w') as f:
+                json.dump({'rules': list(self.rules.values())}, f, indent=4)
+
+    def _save_breached(self):
+        if self.alerts_file:
+            with open(self.alerts_file, 'w') as f:
+                json.dump(self.breached, f)
+        self.breached_changed = False
+
+    def add_rule(self, user, rule_type, limit, category=None, days=7):
+        """
+        Register a rule and return it
+
+        Raises:
+            ValueError: For an unknown rule type, a non-string category or a non-positive limit/window
+        """
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"Unknown rule type: {rule_type}")
+        if category is not None and not isinstance(category, str):
+            raise ValueError("category must be a string")
+        if float(limit) <= 0 or int(days) <= 0:
+            raise ValueError("limit and days must be positive")
+
+        with self.lock:
+            rule = {
+                'id': self.next_id,
+                'user': user,
+                'type': rule_type,
+                'category': category.upper() if category else ALL_SPENDING,
+                'limit': round(float(limit), 2),
+                'days': int(days)
+            }
+            if self._register(rule):
+                self._seed(user, {(user, rule['category'])})
+            self._save()
+        return rule
+
+    def user_rules(self, user):
+        return [rule for rule in self.rules.values() if rule['user'] == user]
+
+    def set_daily_forecast(self, user, daily_spending, category=None):
+        """
+        Forecast spending per day, used by forecast_overshoot rules instead of the month's run rate
+        """
+        with self.lock:
+            self.daily_forecast[(user, category.upper() if category else ALL_SPENDING)] = float(daily_spending)
+
+    def _watches_for(self, user, category):
+        cache = self.match_cache[user]
+        if category not in cache:
+            name = str(category).upper()
+            cache[category] = [pattern for pattern in self.patterns_by_user.get(user, ())
+                               if pattern == ALL_SPENDING or pattern in name]
+        return cache[category]
+
+    def process(self, transactions):
+        """
+        Fold a batch of transactions into the running state and check affected rules
+
+        Args:
+            transactions: DataFrame with 'user', 'date', 'amount', 'category' columns
+
+        Returns:
+            List of alert dicts for rules that newly went over their limit
+        """
+        dates = pd.to_datetime(transactions['date'])
+        transactions = transactions[dates.notna()]
+        if transactions.empty:
+            return []
+
+        days = to_day_ordinals(dates[dates.notna()])
+        return self._process_batch(pd.DataFrame({
+            'user': transactions['user'].to_numpy(),
+            'category': transactions['category'].fillna('other').to_numpy(),
+            'day': days,
+            'month': day_ordinals_to_months(days),
+            'cents': to_cents(transactions['amount'])
+        }))
+
+    def process_table(self, user, table):
+        """
+        Same as process, for one user's TransactionTable
+        """
+        if len(table) == 0:
+            return []
+
+        return self._process_batch(self._table_batch(user, table))
+
+    @staticmethod
+    def _table_batch(user, table):
+        return pd.DataFrame({
+            'user': user,
+            'category': np.asarray(table.categories, dtype=object)[table.category_codes],
+            'day': table.days,
+            'month': day_ordinals_to_months(table.days),
+            'cents': table.cents
+        })
+
+    def _fold(self, batch, watches=None):
+        """
+        Add a batch to the state of its watches (or only the given ones)
+
+        Returns {watch: (months touched, first day touched)}. Day buckets are
+        left unpruned so the caller can check windows ending inside the batch.
+        """
+        # Collapse the batch to one row per (user, category, day) before touching state
+        batch = batch[batch['user'].isin(list(self.patterns_by_user))]
+        grouped = batch.groupby(['user', 'category', 'day', 'month'], sort=False)['cents'].sum()
+
+        touched = {}
+        for (user, category, day, month), cents in grouped.items():
+            for pattern in self._watches_for(user, category):
+                watch = (user, pattern)
+                if watches is not None and watch not in watches:
+                    continue
+                day, month = int(day), int(month)
+                self.state[watch].add(day, month, int(cents))
+                months, first_day = touched.get(watch, (set(), day))
+                months.add(month)
+                touched[watch] = (months, min(first_day, day))
+        return touched
+
+    def _process_batch(self, batch):
+        with self.lock:
+            alerts = []
+            for watch, (months, first_day) in self._fold(batch).items():
+                state = self.state[watch]
+                for rule_id in self.rules_by_watch[watch]:
+                    rule = self.rules[rule_id]
+                    if rule['type'] == 'rolling_limit':
+                        alerts.extend(self._check_window(rule, state, first_day))
+                    else:
+                        alerts.extend(self._check_months(rule, watch, state, months))
+                state.prune(self.keep_days[watch])
+            if self.breached_changed:
+                self._save_breached()
+            return alerts
+
+    def _check_months(self, rule, watch, state, months):
+        """
+        Alert for each touched month a monthly_cap/forecast_overshoot rule is over and hasn't alerted for
+        """
+        limit_cents = int(round(rule['limit'] * 100))
+        alerts = []
+        for month in sorted(months):
+            month_start = month_start_day(month)
+            next_month_start = month_start_day(month + 1)
+            # Past months are complete; the latest one is projected from its latest day
+            as_of = min(state.latest_day, next_month_start - 1)
+            month_to_date = state.month_cents[month]
+
+            if rule['type'] == 'monthly_cap':
+                value = month_to_date
+            else:
+                elapsed = as_of - month_start + 1
+                remaining = next_month_start - as_of - 1
+                forecast = self.daily_forecast.get(watch)
+                daily_rate = forecast * 100 if forecast is not None else month_to_date / elapsed
+                value = int(round(month_to_date + daily_rate * remaining))
+
+            alerted = self.breached.get(rule['id'], [])
+            if value > limit_cents and month not in alerted:
+                self.breached[rule['id']] = alerted + [month]
+                self.breached_changed = True
+                alerts.append(self._alert(rule, value, as_of))
+        return alerts
+
+    def _check_window(self, rule, state, first_day):
+        """
+        Alert each time a rolling_limit rule's window goes over its limit, re-arming once it drops back under
+        """
+        limit_cents = int(round(rule['limit'] * 100))
+        was_over = self.breached.get(rule['id']) == 'over'
+        over = was_over
+        alerts = []
+        for end, value in zip(*state.window_totals(rule['days'], first_day)):
+            if value <= limit_cents:
+                over = False
+            elif not over:
+                over = True
+                alerts.append(self._alert(rule, int(value), int(end)))
+
+        if over != was_over:
+            if over:
+                self.breached[rule['id']] = 'over'
+            else:
+                self.breached.pop(rule['id'], None)
+            self.breached_changed = True
+        return alerts
+
+    @staticmethod
+    def _alert(rule, value, day):
+        return {
+            'rule_id': rule['id'],
+            'user': rule['user'],
+            'type': rule['type'],
+            'category': rule['category'],
+            'limit': rule['limit'],
+            'value': value / 100,
+            'date': str(np.datetime64(day, 'D'))
+        }
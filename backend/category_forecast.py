@@ -0,0 +1,152 @@
+"""
+Per-category spending forecasts
+
+The biggest categories get their own Prophet fit, run concurrently in a
+worker pool while the total forecast fits in the main process. Low-volume
+categories fall back to a flat trailing-average baseline. Category forecasts
+are then reconciled top-down so that each day's categories sum to the total
+forecast, and summed into monthly budgets for the dashboard.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from aggregates import SpendingAggregates
+from finance_forecaster import FinanceForecaster
+from transactions import as_table, day_ordinals_to_dates
+
+
+MIN_ACTIVE_DAYS = 20  # Days with spending before a category gets its own model
+MAX_MODELLED_CATEGORIES = 8
+BASELINE_WINDOW_DAYS = 90
+
+
+def category_daily_matrix(transactions):
+    """
+    Daily spending per category over the full history
+
+    transactions can be a user's SpendingAggregates (read from its per-category
+    daily totals), a TransactionTable or a DataFrame.
+
+    Returns:
+        (first day ordinal, category names, (categories, days) array of dollars)
+    """
+    if isinstance(transactions, SpendingAggregates):
+        return transactions.category_daily_matrix()
+
+    table = as_table(transactions).drop_duplicates().without_payments()
+    if len(table) == 0:
+        return 0, [], np.zeros((0, 0))
+
+    first_day = int(table.days.min())
+    n_days = int(table.days.max()) - first_day + 1
+    n_categories = len(table.categories)
+
+    # One bincount over (category, day) cells
+    cells = table.category_codes.astype(np.int64) * n_days + (table.days - first_day)
+    cents = np.bincount(cells, weights=table.cents, minlength=n_categories * n_days)
+    matrix = cents.reshape(n_categories, n_days) / 100
+
+    keep = matrix.sum(axis=1) > 0
+    return first_day, list(table.categories[keep]), matrix[keep]
+
+
+def fit_category(prophet_df, config, periods):
+    """
+    Fit one category's model and return its future daily predictions (runs in a worker)
+
+    Only yhat is used, so Prophet's interval sampling is turned off. The cohort
+    model forecasts total spending, so it never stands in for a category fit.
+    """
+    logging.getLogger('cmdstanpy').disabled = True
+    forecaster = FinanceForecaster({**(config or {}), 'uncertainty_samples': 0, 'cold_start_days': 0},
+                                   verbose=False)
+    forecaster.fit(prophet_df)
+    forecast = forecaster.predict(periods=periods, intervals=False)
+    return forecast['yhat'].to_numpy()[-periods:]
+
+
+def submit_category_fits(transactions, executor, periods=365, config=None):
+    """
+    Start category model fits on executor and return the pending job
+
+    The caller fits the total forecast meanwhile and then hands both to
+    collect_category_forecasts.
+    """
+    first_day, categories, matrix = category_daily_matrix(transactions)
+    n_days = matrix.shape[1]
+
+    active_days = (matrix > 0).sum(axis=1)
+    order = np.argsort(-matrix.sum(axis=1), kind='stable')
+    modelled = [i for i in order if active_days[i] >= MIN_ACTIVE_DAYS][:MAX_MODELLED_CATEGORIES]
+
+    dates = day_ordinals_to_dates(np.arange(first_day, first_day + n_days))
+    futures = {
+        i: executor.submit(fit_category, pd.DataFrame({'ds': dates, 'y': matrix[i]}), config, periods)
+        for i in modelled
+    }
+
+    return {
+        'categories': categories,
+        'periods': periods,
+        'baseline_daily': matrix[:, -BASELINE_WINDOW_DAYS:].mean(axis=1) if n_days else np.zeros(0),
+        'shares': matrix.sum(axis=1) / matrix.sum() if matrix.size else np.zeros(0),
+        'futures': futures
+    }
+
+
+def reconcile(category_daily, total_daily, shares):
+    """
+    Scale category forecasts so each day's categories sum to the total forecast
+
+    Days where the categories predict nothing but the total doesn't are split
+    by historical spending share.
+    """
+    category_sum = category_daily.sum(axis=0)
+    scale = np.divide(total_daily, category_sum, out=np.zeros_like(total_daily), where=category_sum > 0)
+    reconciled = category_daily * scale
+
+    unexplained = category_sum <= 0
+    reconciled[:, unexplained] = shares[:, None] * total_daily[unexplained]
+    return reconciled
+
+
+def collect_category_forecasts(job, total_forecast, months=12):
+    """
+    Wait for the category fits, reconcile them with the total forecast and sum into monthly budgets
+
+    Returns:
+        dict for the 'category_forecast' section of the forecast JSON
+    """
+    categories = job['categories']
+    periods = job['periods']
+    if not categories:
+        return {'dates': [], 'categories': {}}
+
+    category_daily = np.repeat(job['baseline_daily'][:, None], periods, axis=1)
+    methods = ['baseline'] * len(categories)
+    for i, future in job['futures'].items():
+        try:
+            category_daily[i] = np.clip(future.result(), 0, None)
+            methods[i] = 'prophet'
+        except Exception as e:
+            print(f"⚠️  Category forecast failed for {categories[i]}, using baseline: {e}")
+
+    future_forecast = total_forecast.tail(periods)
+    reconciled = reconcile(category_daily, future_forecast['yhat'].to_numpy(dtype=np.float64), job['shares'])
+
+    month = pd.to_datetime(future_forecast['ds']).dt.to_period('M').to_numpy()
+    monthly = pd.DataFrame(reconciled.T).groupby(month).sum().head(months)
+
+    return {
+        'dates': [period.to_timestamp().strftime('%Y-%m-%d') for period in monthly.index],
+        'categories': {
+            name: {
+                'method': methods[i],
+                'monthly_budget': monthly[i].round(2).tolist(),
+                'total_1yr': round(float(monthly[i].sum()), 2)
+            }
+            for i, name in enumerate(categories)
+        }
+    }
@@ -0,0 +1,175 @@
+"""
+Pooled cohort model for cold-start users
+
+Trained offline once over many users' daily spending. Each history is
+normalized by the user's own average, and shared multiplicative profiles are
+learned for day of week, day of month and month of year. For a user with only
+a few weeks of data, a forecast is then the user's (shrunk) spending level
+times those shared profiles: a few array lookups instead of a Stan fit.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'cohort_model.json')
+
+PRIOR_DAYS = 14  # Weight of the cohort's average level, in days of user history
+MIN_USERS = 3
+
+_default_model = None
+
+
+def _profile(values, keys, size):
+    """
+    Mean of values per key, relative to the overall mean (1.0 where a key has no data)
+    """
+    sums = np.bincount(keys, weights=values, minlength=size)
+    counts = np.bincount(keys, minlength=size)
+    means = np.divide(sums, counts, out=np.zeros(size), where=counts > 0)
+    overall = values.mean() if len(values) and values.mean() > 0 else 1.0
+    profile = means / overall
+    profile[counts == 0] = 1.0
+    return profile
+
+
+class CohortModel:
+    """
+    Shared seasonal profiles and level prior learned across users
+    """
+    def __init__(self, day_of_week, day_of_month, month_of_year, mean_level,
+                 residual_lower, residual_upper, n_users):
+        self.day_of_week = np.asarray(day_of_week, dtype=np.float64)
+        self.day_of_month = np.asarray(day_of_month, dtype=np.float64)
+        self.month_of_year = np.asarray(month_of_year, dtype=np.float64)
+        self.mean_level = float(mean_level)
+        self.residual_lower = float(residual_lower)
+        self.residual_upper = float(residual_upper)
+        self.n_users = int(n_users)
+
+    @staticmethod
+    def _calendar(ds):
+        dates = pd.DatetimeIndex(ds)
+        return (dates.dayofweek.to_numpy(), dates.day.to_numpy() - 1, dates.month.to_numpy() - 1)
+
+    def _shape(self, ds):
+        dow, dom, moy = self._calendar(ds)
+        return self.day_of_week[dow] * self.day_of_month[dom] * self.month_of_year[moy]
+
+    @classmethod
+    def train(cls, histories):
+        """
+        Learn the profiles from many Prophet 'ds'/'y' histories
+
+        Profiles are fitted one after another, each on what the previous ones
+        leave unexplained.
+        """
+        normalized = []
+        calendars = []
+        levels = []
+        for prophet_df in histories:
+            y = prophet_df['y'].to_numpy(dtype=np.float64)
+            if len(y) == 0 or y.mean() <= 0:
+                continue
+            levels.append(y.mean())
+            normalized.append(y / y.mean())
+            calendars.append(cls._calendar(prophet_df['ds']))
+
+        if len(levels) < MIN_USERS:
+            raise ValueError(f"Need at least {MIN_USERS} usable histories, got {len(levels)}")
+
+        y = np.concatenate(normalized)
+        dow = np.concatenate([c[0] for c in calendars])
+        dom = np.concatenate([c[1] for c in calendars])
+        moy = np.concatenate([c[2] for c in calendars])
+
+        day_of_week = _profile(y, dow, 7)
+        remaining = y / day_of_week[dow]
+        day_of_month = _profile(remaining, dom, 31)
+        remaining = remaining / day_of_month[dom]
+        month_of_year = _profile(remaining, moy, 12)
+
+        fitted = day_of_week[dow] * day_of_month[dom] * month_of_year[moy]
+        residuals = y - fitted
+
+        return cls(day_of_week, day_of_month, month_of_year, np.median(levels),
+                   np.percentile(residuals, 10), np.percentile(residuals, 90), len(levels))
+
+    def level(self, prophet_df):
+        """
+        User's daily spending level, shrunk toward the cohort average for short histories
+        """
+        n = len(prophet_df)
+        user_mean = prophet_df['y'].mean() if n else 0.0
+        return (n * user_mean + PRIOR_DAYS * self.mean_level) / (n + PRIOR_DAYS)
+
+    def predict(self, prophet_df, periods=365):
+        """
+        Forecast in the same shape as Prophet's (history plus periods future days)
+        """
+        start = prophet_df['ds'].min()
+        ds = pd.date_range(start, prophet_df['ds'].max() + pd.Timedelta(days=periods), freq='D')
+
+        level = self.level(prophet_df)
+        yhat = level * self._shape(ds)
+        return pd.DataFrame({
+            'ds': ds,
+            'yhat': yhat,
+            'yhat_lower': np.clip(yhat + level * self.residual_lower, 0, None),
+            'yhat_upper': yhat + level * self.residual_upper
+        })
+
+    def to_dict(self):
+        return {
+            'day_of_week': self.day_of_week.tolist(),
+            'day_of_month': self.day_of_month.tolist(),
+            'month_of_year': self.month_of_year.tolist(),
+            'mean_level': self.mean_level,
+            'residual_lower': self.residual_lower,
+            'residual_upper': self.residual_upper,
+            'n_users': self.n_users
+        }
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        with open(path, 'r') as f:
+            return cls(**json.load(f))
+
+
+def load_default_model():
+    """
+    The trained cohort model, or None if it hasn't been trained yet
+    """
+    global _default_model
+    if _default_model is None and os.path.exists(DEFAULT_MODEL_PATH):
+        _default_model = CohortModel.load()
+    return _default_model
+
+
+# Offline training: python cohort_model.py [statement.csv ...]
+# Uses every saved per-user aggregate (database/aggregates) plus any CSVs given.
+if __name__ == "__main__":
+    from aggregates import AggregateStore
+    from convert import load_and_process_csv
+    from finance_forecaster import FinanceForecaster
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    histories = []
+
+    for aggregates in AggregateStore(os.path.join(script_dir, 'database', 'aggregates')).stored():
+        histories.append(aggregates.to_prophet_df())
+
+    for path in sys.argv[1:]:
+        histories.append(FinanceForecaster(verbose=False).prepare_data(load_and_process_csv(path)))
+
+    model = CohortModel.train(histories)
+    model.save()
+
+    print(f"✓ Cohort model trained on {model.n_users} users → {DEFAULT_MODEL_PATH}")
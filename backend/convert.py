@@ -2,17 +2,27 @@
 Updated convert.py to save outputs to Flutter frontend folder
 """
 import os
+import numpy as np
 import pandas as pd
 from visualize import main
+from pdf_extract import extract_pdf_to_dataframe
+from transactions import TransactionTable, day_ordinals_to_dates
+from aggregates import SpendingAggregates
+from finance_forecaster import FinanceForecaster, COLD_START_DAYS
 import json
 import shutil
 import subprocess
 import platform
 
 
+CHUNK_ROWS = 100_000
+LARGE_CSV_BYTES = 50 * 1024 * 1024  # Bigger CSVs take the chunked path
+CENTS_RANGE = 2 ** 40  # Packs (day, cents) into one int64 key; amounts are positive and far below this
+
+
 def load_and_process_csv(csv_path):
     """
-    Load CSV in new format and convert to standard format
+    Load CSV in new format and convert to a standard TransactionTable
     """
     print("=" * 60)
     print("LOADING NEW CSV FORMAT")
@@ -24,6 +34,65 @@ def load_and_process_csv(csv_path):
     print(f"  Columns found: {list(df.columns)}")
     print(f"  Total rows: {len(df)}")
     
+    return standardize_transactions(df)
+
+
+def standardize_transactions(df):
+    """
+    Detect date/description/amount columns in a raw statement table and
+    convert it to a TransactionTable
+    """
+    date_col, description_col, amount_col = identify_columns(df)
+    
+    print(f"\n🔍 Identified Columns:")
+    print(f"  Date: {date_col}")
+    print(f"  Description: {description_col}")
+    print(f"  Amount: {amount_col}")
+    
+    table = clean_transactions(df, date_col, description_col, amount_col)
+    print_transaction_summary(table)
+    
+    return table
+
+
+def standardize_pdf_transactions(raw):
+    """
+    Convert rows extracted from a PDF statement to a TransactionTable
+    
+    pdf_extract already names the date/description/amount columns, so no
+    guessing is needed. Rows the statement marks as credits (a CR suffix or a
+    Credit column) are dropped; everything else goes through the same rules as
+    a CSV (amounts unsigned, payments dropped).
+    """
+    raw = raw[raw['direction'] != 'credit']
+    
+    table = clean_transactions(raw, 'date', 'description', 'amount')
+    print_transaction_summary(table)
+    
+    return table
+
+
+def print_transaction_summary(table):
+    """
+    Print counts, date range, total and per-category spending for a TransactionTable
+    """
+    print(f"\n✓ Data Processing Complete:")
+    print(f"  Valid transactions: {len(table)}")
+    if len(table):
+        first, last = day_ordinals_to_dates([table.days.min(), table.days.max()])
+        print(f"  Date range: {first} to {last}")
+    print(f"  Total spending: ${table.cents.sum() / 100:,.2f}")
+    
+    print(f"\n📊 Category Breakdown:")
+    category_summary = table.category_totals()
+    for cat, row in category_summary.iterrows():
+        print(f"  {cat}: ${row['cents'] / 100:,.2f} ({row['count']} transactions)")
+
+
+def identify_columns(df):
+    """
+    Guess which columns hold the date, description and amount
+    """
     # Identify columns
     date_col = None
     for col in df.columns:
@@ -65,37 +134,143 @@ def load_and_process_csv(csv_path):
     if description_col is None:
         description_col = df.columns[1] if len(df.columns) > 1 else None
     
-    print(f"\n🔍 Identified Columns:")
-    print(f"  Date: {date_col}")
-    print(f"  Description: {description_col}")
-    print(f"  Amount: {amount_col}")
+    return date_col, description_col, amount_col
+
+
+def clean_transactions(df, date_col, description_col, amount_col):
+    """
+    Convert identified columns to a TransactionTable and drop non-spending rows
+    """
+    dates = pd.to_datetime(df[date_col])
+    amounts = pd.to_numeric(df[amount_col], errors='coerce').abs()
+    categories = df[description_col] if description_col else None
+    table = TransactionTable.from_columns(dates, amounts, categories)
     
-    # Create standardized DataFrame
-    processed_df = pd.DataFrame()
-    processed_df['date'] = pd.to_datetime(df[date_col])
-    processed_df['amount'] = pd.to_numeric(df[amount_col], errors='coerce').abs()
+    # Clean data (unparseable amounts come through as 0 cents)
+    table = table.take(table.cents > 0)
+    return table.without_payments()
+
+
+def read_csv_in_chunks(csv_path, chunksize=CHUNK_ROWS):
+    """
+    Stream a CSV statement as cleaned TransactionTables of at most chunksize rows
     
-    if description_col:
-        processed_df['category'] = df[description_col].fillna('other')
-    else:
-        processed_df['category'] = 'other'
+    Columns are identified on the first chunk. Like
+    FinanceForecaster.prepare_data, repeated (date, amount) rows are dropped.
+    Statement exports are sorted by date (either way round), so a later chunk
+    can only repeat days inside the previous chunk's date range: the
+    (day, cents) keys seen are kept for those days only, and memory stays
+    bounded by the chunk size however long the file is. (An unsorted file is
+    still read correctly, but repeats further apart than a chunk are kept.)
+    """
+    seen = np.zeros(0, dtype=np.int64)  # sorted (day, cents) keys of the latest chunk's days
+    columns = None
+    rows = 0
     
-    # Clean data
-    processed_df = processed_df.dropna(subset=['amount'])
-    processed_df = processed_df[processed_df['amount'] > 0]
-    processed_df = processed_df[~processed_df['category'].str.contains('PAYMENT', case=False, na=False)]
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        if columns is None:
+            columns = identify_columns(chunk)
+        rows += len(chunk)
+        table = clean_transactions(chunk, *columns)
+        if len(table) == 0:
+            continue
+        
+        # First occurrence of each (day, amount) in the chunk, if the previous chunk didn't have it
+        keys = table.days.astype(np.int64) * CENTS_RANGE + table.cents
+        keys, first = np.unique(keys, return_index=True)
+        new = ~np.isin(keys, seen, assume_unique=True)
+        yield table.take(np.sort(first[new]))
+        
+        # Only this chunk's days can still come up again
+        lowest = int(table.days.min()) * CENTS_RANGE
+        highest = (int(table.days.max()) + 1) * CENTS_RANGE
+        seen = seen[np.searchsorted(seen, lowest):np.searchsorted(seen, highest)]
+        seen = np.union1d(seen, keys)
     
-    print(f"\n✓ Data Processing Complete:")
-    print(f"  Valid transactions: {len(processed_df)}")
-    print(f"  Date range: {processed_df['date'].min()} to {processed_df['date'].max()}")
-    print(f"  Total spending: ${processed_df['amount'].sum():,.2f}")
+    print(f"\n✓ Streamed {rows:,} rows in chunks of {chunksize:,}")
+
+
+def aggregate_csv_in_chunks(csv_path, chunksize=CHUNK_ROWS):
+    """
+    Stream a CSV statement into running daily/monthly/category totals
     
-    print(f"\n📊 Category Breakdown:")
-    category_summary = processed_df.groupby('category')['amount'].agg(['sum', 'count'])
-    for cat, row in category_summary.iterrows():
-        print(f"  {cat}: ${row['sum']:,.2f} ({row['count']} transactions)")
+    Each chunk is folded into a SpendingAggregates and dropped, so peak memory
+    is about one chunk (see read_csv_in_chunks).
+    """
+    aggregates = SpendingAggregates(keep_rows=False)
+    for table in read_csv_in_chunks(csv_path, chunksize):
+        aggregates.add(table)
+    return aggregates
+
+
+def load_large_csv(csv_path, chunksize=CHUNK_ROWS):
+    """
+    Load a CSV statement too large to parse whole into a TransactionTable
     
-    return processed_df[['date', 'amount', 'category']]
+    Only one chunk is held as a DataFrame at a time; the rows are kept as
+    compact table columns (16 bytes each).
+    """
+    table = TransactionTable.concat(list(read_csv_in_chunks(csv_path, chunksize))).sort_by_day()
+    print_transaction_summary(table)
+    return table
+
+
+def forecast_large_csv(csv_path, monthly_income=3500, chunksize=CHUNK_ROWS):
+    """
+    Forecast from a statement too large to load at once (JSON output only, no plot)
+    
+    Returns the same {'json', 'forecast', 'summary'} dict as visualize.main
+    """
+    aggregates = aggregate_csv_in_chunks(csv_path, chunksize)
+    
+    forecaster = FinanceForecaster({'cold_start_days': COLD_START_DAYS})
+    prophet_df = forecaster.prepare_from_aggregates(aggregates)
+    forecast = forecaster.train_and_forecast(prophet_df, periods=365)
+    result_json = forecaster.generate_json_output(
+        forecast, monthly_income=monthly_income, categories=aggregates.category_summary()
+    )
+    
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    json_path = os.path.join(get_flutter_assets_path(script_dir), 'forecast_output.json')
+    with open(json_path, 'w') as f:
+        f.write(result_json)
+    print(f"✓ JSON saved to: {json_path}")
+    
+    return {
+        'json': result_json,
+        'forecast': forecast,
+        'summary': json.loads(result_json)['summary']
+    }
+
+
+def load_and_process_pdf(pdf_path, max_workers=None):
+    """
+    Extract transactions from a PDF statement and convert to a TransactionTable
+    """
+    print("=" * 60)
+    print("LOADING PDF STATEMENT")
+    print("=" * 60)
+    
+    df = extract_pdf_to_dataframe(pdf_path, max_workers=max_workers)
+    
+    print(f"\n📋 PDF Statement Extracted:")
+    print(f"  Total rows: {len(df)}")
+    
+    if df.empty:
+        raise ValueError(f"No transactions found in {pdf_path}")
+    
+    return standardize_pdf_transactions(df)
+
+
+def load_statement(path):
+    """
+    Load a CSV or PDF statement based on its file extension
+    """
+    if path.lower().endswith('.pdf'):
+        return load_and_process_pdf(path)
+    if os.path.getsize(path) > LARGE_CSV_BYTES:
+        return load_large_csv(path)
+    return load_and_process_csv(path)
 
 
 def get_flutter_assets_path(script_dir):
@@ -115,21 +290,24 @@ def main_pipeline(csv_path, monthly_income=3500):
     """
     Complete pipeline that saves to Flutter assets folder
     """
-    # Load and process the CSV
-    df = load_and_process_csv(csv_path)
+    # Very large CSV histories are aggregated out of core instead of loaded whole
+    if csv_path.lower().endswith('.csv') and os.path.getsize(csv_path) > LARGE_CSV_BYTES:
+        return forecast_large_csv(csv_path, monthly_income=monthly_income)
+    
+    # Load and process the statement (CSV or PDF)
+    table = load_statement(csv_path)
     
     print("\n" + "=" * 60)
     print("PROCESSED DATA PREVIEW")
     print("=" * 60)
-    print(df.head(10))
+    print(table.take(slice(0, 10)).to_dataframe())
     
     print("\n" + "=" * 60)
     print("RUNNING FORECAST PIPELINE")
     print("=" * 60)
     
     # Run forecasting using visualize.py (creates the fancy graph!)
-    forecast_df = df[['date', 'amount', 'category']]
-    results = main(forecast_df, monthly_income=monthly_income)
+    results = main(table, monthly_income=monthly_income)
     
     # Get paths
     script_dir = os.path.dirname(os.path.abspath(__file__))
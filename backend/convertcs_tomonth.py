@@ -2,13 +2,15 @@ import csv
 import json
 from collections import defaultdict
 from datetime import datetime
+from transactions import TransactionTable, to_cents, to_day_ordinals
 
 def convert_csv_to_json(input_file, output_file):
     # Dictionary to store transactions grouped by month
     monthly_data = defaultdict(lambda: {
-        'transactions': [],
-        'total_spending': 0.0
+        'transactions': []
     })
+    amounts = []
+    dates = []
     
     # Read the CSV file with UTF-8-sig encoding to handle BOM
     with open(input_file, 'r', encoding='utf-8-sig') as csvfile:
@@ -31,7 +33,16 @@ def convert_csv_to_json(input_file, output_file):
             # Add to monthly data
             monthly_data[month_key]['month'] = month_name
             monthly_data[month_key]['transactions'].append(transaction)
-            monthly_data[month_key]['total_spending'] += float(row['Amount'])
+            amounts.append(transaction['amount'])
+            dates.append(date)
+    
+    # Monthly totals are summed in integer cents to avoid float drift
+    table = TransactionTable(to_cents(amounts), to_day_ordinals(dates), [0] * len(amounts), ['all'])
+    first_month, month_cents, _ = table.monthly_totals()
+    month_totals = {
+        datetime(1970 + (first_month + i) // 12, (first_month + i) % 12 + 1, 1).strftime('%Y-%m'): cents
+        for i, cents in enumerate(month_cents)
+    }
     
     # Convert to list and sort by month
     result = []
@@ -39,7 +50,7 @@ def convert_csv_to_json(input_file, output_file):
         data = monthly_data[month_key]
         result.append({
             'month': data['month'],
-            'total_spending': round(data['total_spending'], 2),
+            'total_spending': int(month_totals[month_key]) / 100,
             'transaction_count': len(data['transactions']),
             'transactions': sorted(data['transactions'], key=lambda x: x['date'])
         })
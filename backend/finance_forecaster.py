@@ -3,100 +3,171 @@ from prophet import Prophet
 import json
 from datetime import datetime
 import numpy as np
+from transactions import TransactionTable, as_table, day_ordinals_to_dates
+from scenarios import ScenarioEngine
+from cohort_model import CohortModel, load_default_model
+
+# Model settings; backtest.py compares these against cheaper candidates
+DEFAULT_CONFIG = {
+    'yearly_seasonality': True,
+    'weekly_seasonality': True,
+    'changepoint_prior_scale': 0.8,  # Very flexible for limited data
+    'seasonality_prior_scale': 15,   # Strong seasonality
+    'seasonality_mode': 'multiplicative',  # Better for spending patterns
+    'changepoint_range': 0.95,  # Allow changes throughout entire history
+    'monthly_fourier_order': 5,  # 0 disables monthly seasonality
+    'uncertainty_samples': 1000,  # Prophet's default; dominates predict time. Needed for intervals
+    'cold_start_days': 0  # Shorter histories use the cohort model when one is trained (0: never)
+}
+
+# Per-user forecasts opt into the cohort model with this cold_start_days; backtests and
+# category fits keep 0 so they always fit the model they're given
+COLD_START_DAYS = 90
 
 class FinanceForecaster:
     """
     Improved forecaster for transaction data with better handling of sparse patterns
     """
-    def __init__(self):
+    def __init__(self, config=None, verbose=True, cohort_model=None):
         self.model = None
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.verbose = verbose
+        self.daily_avg = None
+        self.cohort_model = cohort_model
+        self.history = None
         
     def prepare_data(self, df, date_column='date', amount_column='amount'):
         """
         Prepare daily transaction data with proper aggregation
+        
+        df can be a TransactionTable or a (date, amount[, category]) DataFrame
         """
-        df_copy = df.copy()
-        df_copy[date_column] = pd.to_datetime(df_copy[date_column])
+        table = as_table(df, date_column, amount_column)
         
         # Remove duplicates first
-        df_copy = df_copy.drop_duplicates(subset=[date_column, amount_column])
+        table = table.drop_duplicates()
         
         # Filter out payment entries (they're not spending)
-        if 'category' in df_copy.columns:
-            df_copy = df_copy[~df_copy['category'].str.contains('PAYMENT', case=False, na=False)]
+        table = table.without_payments()
         
-        # Aggregate by day
-        daily_spending = df_copy.groupby(date_column)[amount_column].sum().reset_index()
+        # Aggregate by day, filling missing days with zero (important for Prophet to understand spending patterns)
+        first_day, daily_cents, _ = table.daily_totals()
         
         # Create Prophet format
         prophet_df = pd.DataFrame({
-            'ds': daily_spending[date_column],
-            'y': daily_spending[amount_column]
+            'ds': day_ordinals_to_dates(np.arange(first_day, first_day + len(daily_cents))),
+            'y': daily_cents / 100
         })
         
-        # Fill missing days with zero (important for Prophet to understand spending patterns)
-        date_range = pd.date_range(
-            start=prophet_df['ds'].min(),
-            end=prophet_df['ds'].max(),
-            freq='D'
-        )
-        complete_df = pd.DataFrame({'ds': date_range})
-        prophet_df = complete_df.merge(prophet_df, on='ds', how='left')
-        prophet_df['y'] = prophet_df['y'].fillna(0)
-        
         return prophet_df
     
-    def train_and_forecast(self, prophet_df, periods=365):
+    def prepare_from_aggregates(self, aggregates):
         """
-        Train model with improved settings for spending data
+        Prophet data straight from a user's materialized daily totals (see aggregates.py)
         """
-        # Calculate statistics for reasonable bounds
-        daily_avg = prophet_df[prophet_df['y'] > 0]['y'].mean()
-        daily_std = prophet_df[prophet_df['y'] > 0]['y'].std()
-        
-        print(f"\n📊 Historical Statistics:")
-        print(f"  Average daily spending: ${daily_avg:.2f}")
-        print(f"  Std deviation: ${daily_std:.2f}")
-        print(f"  Days with transactions: {(prophet_df['y'] > 0).sum()}")
-        print(f"  Total days: {len(prophet_df)}")
+        return aggregates.to_prophet_df()
+    
+    def build_model(self):
+        """
+        Create an unfitted Prophet model from the config
+        """
+        config = self.config
         
         # More flexible model for spending patterns
-        self.model = Prophet(
-            yearly_seasonality=True,
-            weekly_seasonality=True,
+        model = Prophet(
+            yearly_seasonality=config['yearly_seasonality'],
+            weekly_seasonality=config['weekly_seasonality'],
             daily_seasonality=False,
-            changepoint_prior_scale=0.8,  # Very flexible for limited data
-            seasonality_prior_scale=15,   # Strong seasonality
-            seasonality_mode='multiplicative',  # Better for spending patterns
+            changepoint_prior_scale=config['changepoint_prior_scale'],
+            seasonality_prior_scale=config['seasonality_prior_scale'],
+            seasonality_mode=config['seasonality_mode'],
             interval_width=0.80,
-            changepoint_range=0.95  # Allow changes throughout entire history
+            changepoint_range=config['changepoint_range'],
+            uncertainty_samples=config['uncertainty_samples']
         )
         
         # Add monthly seasonality
-        self.model.add_seasonality(name='monthly', period=30.5, fourier_order=5)
+        if config['monthly_fourier_order'] > 0:
+            model.add_seasonality(name='monthly', period=30.5, fourier_order=config['monthly_fourier_order'])
+        
+        return model
+    
+    def fit(self, prophet_df):
+        """
+        Fit the model on daily spending history
+        """
+        # Calculate statistics for reasonable bounds
+        self.daily_avg = prophet_df[prophet_df['y'] > 0]['y'].mean()
+        daily_std = prophet_df[prophet_df['y'] > 0]['y'].std()
+        
+        if self.verbose:
+            print(f"\n📊 Historical Statistics:")
+            print(f"  Average daily spending: ${self.daily_avg:.2f}")
+            print(f"  Std deviation: ${daily_std:.2f}")
+            print(f"  Days with transactions: {(prophet_df['y'] > 0).sum()}")
+            print(f"  Total days: {len(prophet_df)}")
+        
+        # Too little history for a stable per-user fit: use the shared cohort model
+        if len(prophet_df) < self.config['cold_start_days']:
+            cohort = self.cohort_model or load_default_model()
+            if cohort is not None:
+                if self.verbose:
+                    print(f"\n👥 Short history, using cohort model ({cohort.n_users} users)")
+                self.model = cohort
+                self.history = prophet_df
+                return self.model
+        
+        self.model = self.build_model()
         
         # Fit model
-        print("\n🔄 Training Prophet model...")
+        if self.verbose:
+            print("\n🔄 Training Prophet model...")
         self.model.fit(prophet_df)
         
+        return self.model
+    
+    def predict(self, periods=365, intervals=True):
+        """
+        Forecast the fitted model forward, with reasonable bounds applied
+        
+        The monthly summary, JSON output and savings outlook all need the
+        yhat_lower/yhat_upper intervals, so they're required unless intervals
+        is False (point forecasts, e.g. category fits with uncertainty_samples 0).
+        """
         # Forecast
-        future = self.model.make_future_dataframe(periods=periods, freq='D')
-        forecast = self.model.predict(future)
+        if isinstance(self.model, CohortModel):
+            forecast = self.model.predict(self.history, periods)
+        else:
+            future = self.model.make_future_dataframe(periods=periods, freq='D')
+            forecast = self.model.predict(future)
         
         # Apply reasonable bounds
         forecast['yhat'] = forecast['yhat'].clip(lower=0)
-        forecast['yhat_lower'] = forecast['yhat_lower'].clip(lower=0)
         
         # Cap at 5x historical daily average (prevent extreme predictions)
-        max_daily = daily_avg * 5
+        max_daily = self.daily_avg * 5
         forecast['yhat'] = forecast['yhat'].clip(upper=max_daily)
+        
+        # Prophet leaves out the intervals when uncertainty_samples is 0
+        if 'yhat_lower' not in forecast.columns:
+            if intervals:
+                raise ValueError("Forecast intervals need uncertainty_samples > 0")
+            return forecast
+        forecast['yhat_lower'] = forecast['yhat_lower'].clip(lower=0)
         forecast['yhat_upper'] = forecast['yhat_upper'].clip(upper=max_daily * 1.5)
         
         return forecast
     
-    def generate_json_output(self, forecast, original_df=None, monthly_income=0):
+    def train_and_forecast(self, prophet_df, periods=365):
+        """
+        Train model with improved settings for spending data
+        """
+        self.fit(prophet_df)
+        return self.predict(periods)
+    
+    def monthly_forecast(self, forecast, months=12):
         """
-        Generate monthly forecast summary
+        Sum the daily forecast (and its bounds) into calendar months
         """
         # Get future predictions (next 365 days)
         future_predictions = forecast[forecast['ds'] > forecast['ds'].max() - pd.Timedelta(days=365)]
@@ -112,7 +183,16 @@ class FinanceForecaster:
         monthly_forecast['month'] = monthly_forecast['month'].dt.to_timestamp()
         
         # Get only next 12 months
-        monthly_forecast = monthly_forecast.head(12)
+        return monthly_forecast.head(months)
+    
+    def generate_json_output(self, forecast, original_df=None, monthly_income=0, categories=None):
+        """
+        Generate monthly forecast summary
+        
+        categories can be passed precomputed (SpendingAggregates.category_summary)
+        instead of being recomputed from original_df (a TransactionTable or DataFrame)
+        """
+        monthly_forecast = self.monthly_forecast(forecast)
         
         total_predicted_spending = monthly_forecast['yhat'].sum()
         avg_monthly_spending = monthly_forecast['yhat'].mean()
@@ -134,6 +214,7 @@ class FinanceForecaster:
                 'savings_rate': round((projected_savings / annual_income * 100), 2) if annual_income > 0 else 0,
                 'avg_monthly_spending': round(avg_monthly_spending, 2)
             },
+            'savings_outlook': ScenarioEngine(monthly_forecast, monthly_income).baseline(),
             'metadata': {
                 'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'forecast_months': 12,
@@ -141,15 +222,18 @@ class FinanceForecaster:
             }
         }
         
-        if original_df is not None and 'category' in original_df.columns:
+        if categories is not None:
+            output['categories'] = categories
+        elif original_df is not None and (isinstance(original_df, TransactionTable)
+                                          or 'category' in original_df.columns):
             # Remove payment entries from category analysis
-            spending_df = original_df[~original_df['category'].str.contains('PAYMENT', case=False, na=False)]
-            category_spending = spending_df.groupby('category')['amount'].agg(['sum', 'count']).round(2)
+            table = as_table(original_df).without_payments()
+            category_spending = table.category_totals()
             output['categories'] = {
                 cat: {
-                    'total': float(row['sum']),
+                    'total': int(row['cents']) / 100,
                     'count': int(row['count']),
-                    'avg_per_transaction': round(row['sum'] / row['count'], 2)
+                    'avg_per_transaction': round(row['cents'] / row['count'] / 100, 2)
                 }
                 for cat, row in category_spending.iterrows()
             }
@@ -165,19 +249,19 @@ class FinanceForecaster:
         print("="*60)
         
         # Clean data
-        df_clean = df.copy()
-        df_clean = df_clean.drop_duplicates()
-        if 'category' in df_clean.columns:
-            df_clean = df_clean[~df_clean['category'].str.contains('PAYMENT', case=False, na=False)]
+        table = as_table(df, date_column, amount_column)
+        table = table.drop_duplicates().without_payments()
         
         print(f"\nCleaned data:")
-        print(f"  Total transactions: {len(df_clean)}")
-        print(f"  Date range: {df_clean[date_column].min()} to {df_clean[date_column].max()}")
-        print(f"  Total spending: ${df_clean[amount_column].sum():.2f}")
+        print(f"  Total transactions: {len(table)}")
+        if len(table):
+            first, last = day_ordinals_to_dates([table.days.min(), table.days.max()])
+            print(f"  Date range: {first} to {last}")
+        print(f"  Total spending: ${table.cents.sum() / 100:.2f}")
         
-        prophet_df = self.prepare_data(df_clean, date_column, amount_column)
+        prophet_df = self.prepare_data(table)
         forecast = self.train_and_forecast(prophet_df, periods=365)
-        output_json = self.generate_json_output(forecast, df_clean, monthly_income)
+        output_json = self.generate_json_output(forecast, table, monthly_income)
         
         return output_json, forecast, prophet_df
 
@@ -0,0 +1,117 @@
+"""
+Batch ingestion for uploaded statements
+
+Parses several CSV/PDF statements concurrently in a shared process pool,
+merges them into one time-sorted TransactionTable with duplicates across
+files removed, and forecasts once from the user's aggregated history.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from category_forecast import submit_category_fits, collect_category_forecasts
+from convert import load_statement, standardize_pdf_transactions, get_flutter_assets_path
+from finance_forecaster import FinanceForecaster, COLD_START_DAYS
+from pdf_extract import extract_page_range, page_ranges, rows_to_dataframe
+from scenarios import ScenarioEngine, category_shares
+from transactions import TransactionTable
+
+
+_executor = None
+
+
+def get_executor():
+    """
+    Shared worker pool, created on first use so importing this module stays cheap
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _executor
+
+
+def merge_statements(tables):
+    """
+    Merge standardized tables into one time-sorted table
+
+    Repeated (date, amount) rows are counted once, the same rule as
+    FinanceForecaster.prepare_data, so the same rows total the same however
+    they are split across files (overlapping exports included).
+    """
+    return TransactionTable.concat(tables).drop_duplicates().sort_by_day()
+
+
+def parse_statement_files(files, executor=None):
+    """
+    Parse a batch of statements concurrently
+
+    Every CSV and every page range of every PDF is submitted to the pool up
+    front, so the batch takes about as long as its largest unit of work.
+    CSVs over convert.LARGE_CSV_BYTES are read in chunks rather than whole.
+
+    Args:
+        files: List of (path, original_filename) tuples
+        executor: Pool to run on (defaults to the shared pool)
+
+    Returns:
+        List of TransactionTables, one per file
+    """
+    executor = executor or get_executor()
+
+    pending = []
+    for path, filename in files:
+        if filename.lower().endswith('.pdf'):
+            futures = [executor.submit(extract_page_range, path, start, stop)
+                       for start, stop in page_ranges(path)]
+            pending.append((filename, True, futures))
+        else:
+            pending.append((filename, False, [executor.submit(load_statement, path)]))
+
+    tables = []
+    for filename, is_pdf, futures in pending:
+        try:
+            if is_pdf:
+                raw = rows_to_dataframe([f.result() for f in futures])
+                if raw.empty:
+                    raise ValueError("no transactions found")
+                tables.append(standardize_pdf_transactions(raw))
+            else:
+                tables.append(futures[0].result())
+        except Exception as e:
+            raise ValueError(f"Could not parse {filename}: {e}") from e
+
+    return tables
+
+
+def save_frontend_json(result):
+    """
+    Write a forecast result where the Flutter frontend reads it
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    json_path = os.path.join(get_flutter_assets_path(script_dir), 'forecast_output.json')
+    with open(json_path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+
+def run_forecast(aggregates, monthly_income=3500):
+    """
+    Forecast a user's whole history from their SpendingAggregates and save the JSON for the Flutter frontend
+
+    Returns:
+        (forecast JSON as a dict, ScenarioEngine for what-if queries on this forecast)
+    """
+    forecaster = FinanceForecaster({'cold_start_days': COLD_START_DAYS})
+
+    # Category models fit in the pool while the total model fits here
+    category_job = submit_category_fits(aggregates, get_executor(), periods=365, config=forecaster.config)
+    prophet_df = forecaster.prepare_from_aggregates(aggregates)
+    forecast = forecaster.train_and_forecast(prophet_df, periods=365)
+    result_json = forecaster.generate_json_output(forecast, monthly_income=monthly_income,
+                                                  categories=aggregates.category_summary())
+
+    result = json.loads(result_json)
+    result['category_forecast'] = collect_category_forecasts(category_job, forecast)
+    save_frontend_json(result)
+
+    engine = ScenarioEngine(forecaster.monthly_forecast(forecast), monthly_income, category_shares(aggregates))
+    return result, engine
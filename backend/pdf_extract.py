@@ -0,0 +1,224 @@
+"""
+PDF bank statement extraction
+
+Splits a statement PDF into page ranges and extracts transaction rows from
+each range in a process pool. Pages are merged back in document order so the
+result can go straight into convert.standardize_pdf_transactions.
+
+Amounts are kept unsigned: whether a minus sign means money out (bank
+accounts) or a payment/refund (credit cards) depends on the statement. Rows
+are only marked as debits or credits when the statement says so, with a
+DR/CR marker or by printing the amount under a Debit/Credit column.
+"""
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import pdfplumber
+
+
+PAGES_PER_CHUNK = 8
+
+DATE_FORMATS = ['%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d', '%b %d, %Y', '%b %d %Y', '%d %b %Y']
+MONEY_PATTERN = re.compile(r'^\(?-?\$?-?[\d,]*\d\.\d{2}\)?(?:\s?CR|\s?DR)?$', re.IGNORECASE)
+
+# Fallback for statements that print transactions as plain text instead of tables
+TEXT_DATE = r'\d{1,2}/\d{1,2}/\d{2,4}|\d{4}-\d{2}-\d{2}|[A-Z][a-z]{2} \d{1,2},? \d{4}'
+TEXT_MONEY = r'\(?-?\$?-?[\d,]*\d\.\d{2}\)?(?:\s?(?:CR|DR|Cr|Dr))?'
+TEXT_ROW_PATTERN = re.compile(
+    rf'^(?P<date>{TEXT_DATE})\s+'
+    rf'(?:(?:{TEXT_DATE})\s+)?'  # posting date
+    rf'(?P<description>.+?)\s+'
+    rf'(?P<amount>{TEXT_MONEY})'
+    rf'(?:\s+{TEXT_MONEY})?$'
+)
+
+DEBIT_HEADERS = ('debit', 'withdrawal', 'money out', 'charges')
+CREDIT_HEADERS = ('credit', 'deposit', 'money in', 'payments')
+
+# Cell positions of a table's Debit/Credit columns, applied to later rows with as many cells
+ColumnHeader = namedtuple('ColumnHeader', ['debit', 'credit', 'width'])
+
+
+def parse_date(value):
+    """
+    Parse a statement date cell, returning None if it isn't a date
+    """
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_money(value):
+    """
+    Parse a money cell like '$1,234.56', '(12.00)' or '45.10 CR' to its unsigned amount,
+    returning None if it isn't money
+    """
+    value = value.strip()
+    if not MONEY_PATTERN.match(value):
+        return None
+    return float(re.sub(r'[^\d.]', '', value))
+
+
+def money_direction(value):
+    """
+    'debit' or 'credit' for a money cell with a DR/CR suffix, otherwise None
+    """
+    suffix = value.strip()[-2:].upper()
+    return {'DR': 'debit', 'CR': 'credit'}.get(suffix)
+
+
+def parse_header(cells):
+    """
+    Find the Debit/Credit columns in a table header row, or None if it isn't one
+    """
+    cells = [(c or '').strip().lower() for c in cells]
+    if any(parse_date(cell) is not None for cell in cells if cell):
+        return None
+    debit = {i for i, cell in enumerate(cells) if any(h in cell for h in DEBIT_HEADERS)}
+    credit = {i for i, cell in enumerate(cells) if any(h in cell for h in CREDIT_HEADERS)}
+    # A combined 'Debit/Credit' column doesn't tell them apart
+    debit, credit = debit - credit, credit - debit
+    if not debit and not credit:
+        return None
+    return ColumnHeader(tuple(sorted(debit)), tuple(sorted(credit)), len(cells))
+
+
+def parse_row(cells):
+    """
+    Turn one table row into (date, description, amount, direction, column, width),
+    or None for headers and totals
+
+    The first date cell is the transaction date and later ones (the posting
+    date) are skipped. The first money cell is taken as the transaction
+    amount; later money cells are usually the running balance. direction comes
+    from a DR/CR marker on the amount, and column/width (the amount's cell
+    position and the row's cell count) let a Debit/Credit header decide it later.
+    """
+    width = len(cells)
+    date = None
+    amount = None
+    direction = None
+    column = None
+    description_parts = []
+    for i, cell in enumerate(cells):
+        cell = (cell or '').strip()
+        if not cell:
+            continue
+        parsed = parse_date(cell)
+        if parsed is not None:
+            if date is None:
+                date = parsed
+            continue
+        money = parse_money(cell)
+        if money is not None:
+            if amount is None:
+                amount, direction, column = money, money_direction(cell), i
+            continue
+        description_parts.append(cell)
+
+    if date is None or amount is None:
+        return None
+    return date, ' '.join(description_parts) or 'other', amount, direction, column, width
+
+
+def extract_page_range(pdf_path, start, stop):
+    """
+    Extract transaction rows from pages [start, stop) of a PDF
+
+    Runs inside a worker process, so it opens its own handle to the file.
+    Debit/Credit column headers are returned in place as ColumnHeader entries,
+    since a table continued on a later page (maybe in another range) reuses them.
+    """
+    rows = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[start:stop]:
+            page_rows = []
+            for table in page.extract_tables():
+                for cells in table:
+                    row = parse_row(cells)
+                    if row is None:
+                        row = parse_header(cells)
+                    if row is not None:
+                        page_rows.append(row)
+
+            if not any(not isinstance(row, ColumnHeader) for row in page_rows):
+                for line in (page.extract_text() or '').splitlines():
+                    match = TEXT_ROW_PATTERN.match(line.strip())
+                    if match:
+                        row = parse_row([match.group('date'), match.group('description'), match.group('amount')])
+                        if row is not None:
+                            page_rows.append(row)
+
+            rows.extend(page_rows)
+    return rows
+
+
+def page_ranges(pdf_path, pages_per_chunk=PAGES_PER_CHUNK):
+    """
+    Split a PDF into (start, stop) page ranges of at most pages_per_chunk pages
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    return [(start, min(start + pages_per_chunk, page_count))
+            for start in range(0, page_count, pages_per_chunk)]
+
+
+def extract_pdf_to_dataframe(pdf_path, max_workers=None, pages_per_chunk=PAGES_PER_CHUNK):
+    """
+    Extract all transaction rows from a statement PDF
+
+    Args:
+        pdf_path: Path to the statement PDF
+        max_workers: Worker processes to use (defaults to one per CPU)
+        pages_per_chunk: Pages handled by a single task
+
+    Returns:
+        DataFrame with 'date', 'description', 'amount', 'direction' columns in page order
+    """
+    ranges = page_ranges(pdf_path, pages_per_chunk)
+
+    if len(ranges) <= 1:
+        # Not worth starting a pool for a short statement
+        chunks = [extract_page_range(pdf_path, start, stop) for start, stop in ranges]
+    else:
+        workers = min(max_workers or os.cpu_count() or 1, len(ranges))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(extract_page_range,
+                                   [pdf_path] * len(ranges),
+                                   [start for start, _ in ranges],
+                                   [stop for _, stop in ranges]))
+
+    return rows_to_dataframe(chunks)
+
+
+def rows_to_dataframe(chunks):
+    """
+    Merge per-range row lists (already in page order) into one DataFrame
+
+    A row without a DR/CR marker takes its direction from the latest Debit/Credit
+    header with the same number of cells, if its amount sits under one of them.
+    """
+    headers = {}
+    rows = []
+    for chunk in chunks:
+        for row in chunk:
+            if isinstance(row, ColumnHeader):
+                headers[row.width] = row
+                continue
+            date, description, amount, direction, column, width = row
+            header = headers.get(width)
+            if direction is None and header is not None:
+                if column in header.debit:
+                    direction = 'debit'
+                elif column in header.credit:
+                    direction = 'credit'
+            rows.append((date, description, amount, direction))
+    return pd.DataFrame(rows, columns=['date', 'description', 'amount', 'direction'])
@@ -0,0 +1,132 @@
+"""
+Signed session tokens
+
+/login verifies credentials against the user store once and issues a signed,
+timestamped token. Later requests present the token and are checked by
+signature alone, with recently seen tokens kept in a bounded in-memory LRU
+cache with TTL, so the user store stays off the request path. Logout revokes
+one session; a password change revokes all of a user's sessions by bumping
+their generation number.
+
+Generations are stored with the user records and passed in at startup, and
+logout revocations are saved to a file, so neither comes back to life when
+the server restarts with the same secret key.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+
+SESSION_TTL = 7 * 24 * 60 * 60  # One week
+CACHE_SIZE = 10_000
+
+
+class SessionManager:
+    """
+    Issues, validates and revokes session tokens
+    """
+    def __init__(self, secret_key, max_age=SESSION_TTL, cache_size=CACHE_SIZE, generations=None, revoked_file=None):
+        """
+        Args:
+            secret_key: Key tokens are signed with
+            max_age: Token lifetime in seconds
+            cache_size: Most tokens kept in the validation cache
+            generations: email -> generation, as stored with the user records
+            revoked_file: JSON file logout revocations are kept in across restarts
+        """
+        self.serializer = URLSafeTimedSerializer(secret_key, salt='smartspend-session')
+        self.max_age = max_age
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # token -> (payload, expires_at)
+        self.revoked = {}  # session id -> expires_at, dropped once the token would have expired anyway
+        self.generations = dict(generations or {})  # email -> generation; tokens from older generations are invalid
+        self.revoked_file = revoked_file
+        self.lock = threading.Lock()
+
+        if revoked_file and os.path.exists(revoked_file):
+            with open(revoked_file, 'r') as f:
+                now = time.time()
+                self.revoked = {sid: exp for sid, exp in json.load(f).items() if exp > now}
+
+    def issue(self, email):
+        """
+        New session token for an already verified user
+        """
+        with self.lock:
+            generation = self.generations.get(email, 0)
+        return self.serializer.dumps({'email': email, 'sid': secrets.token_hex(8), 'gen': generation})
+
+    def _decode(self, token):
+        """
+        Payload and expiry for a token, from the cache or by checking its signature
+        """
+        now = time.time()
+        with self.lock:
+            cached = self.cache.get(token)
+            if cached is not None:
+                if cached[1] > now:
+                    self.cache.move_to_end(token)
+                    return cached
+                del self.cache[token]
+
+        try:
+            payload, signed_at = self.serializer.loads(token, max_age=self.max_age, return_timestamp=True)
+        except (BadSignature, SignatureExpired):
+            return None
+        entry = (payload, signed_at.timestamp() + self.max_age)
+
+        with self.lock:
+            self.cache[token] = entry
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return entry
+
+    def validate(self, token):
+        """
+        Email of the token's user, or None if it is invalid, expired or revoked
+        """
+        entry = self._decode(token)
+        if entry is None:
+            return None
+        payload = entry[0]
+
+        with self.lock:
+            if payload['sid'] in self.revoked:
+                return None
+            if payload['gen'] != self.generations.get(payload['email'], 0):
+                return None
+        return payload['email']
+
+    def revoke(self, token):
+        """
+        End one session
+        """
+        entry = self._decode(token)
+        if entry is None:
+            return
+        payload, expires_at = entry
+
+        now = time.time()
+        with self.lock:
+            self.revoked[payload['sid']] = expires_at
+            self.cache.pop(token, None)
+            # Forget revocations for tokens that have expired on their own
+            self.revoked = {sid: exp for sid, exp in self.revoked.items() if exp > now}
+            if self.revoked_file:
+                with open(self.revoked_file, 'w') as f:
+                    json.dump(self.revoked, f)
+
+    def revoke_user(self, email):
+        """
+        End every session for a user (e.g. after a password change)
+
+        Returns the user's new generation, to be saved with their record.
+        """
+        with self.lock:
+            self.generations[email] = self.generations.get(email, 0) + 1
+            return self.generations[email]
@@ -0,0 +1,217 @@
+"""
+Compact array-backed transaction storage
+
+Amounts are kept as int64 cents (no float drift in totals), dates as int32
+day ordinals (days since 1970-01-01) and categories as int32 codes into a
+shared dictionary. That's 16 bytes per transaction instead of a float, a
+datetime and a Python string object per row, and groupbys become bincounts.
+"""
+import numpy as np
+import pandas as pd
+
+
+def to_cents(amounts):
+    """
+    Convert dollar amounts (scalar or array) to integer cents
+    """
+    return np.rint(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+
+
+def to_day_ordinals(dates):
+    """
+    Convert dates (anything pd.to_datetime accepts) to int32 days since 1970-01-01
+
+    Missing dates (NaT) have no ordinal and must be dropped first.
+    """
+    days = pd.to_datetime(dates).to_numpy().astype('datetime64[D]')
+    return days.astype(np.int64).astype(np.int32)
+
+
+def day_ordinals_to_dates(days):
+    """
+    Convert day ordinals back to datetime64 values
+    """
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[ns]')
+
+
+def day_ordinals_to_months(days):
+    """
+    Convert day ordinals to month ordinals (months since 1970-01)
+    """
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def sum_by(codes, cents, size):
+    """
+    Sum cents into size buckets by integer code, with counts
+
+    bincount works in float64, which is exact for totals below 2**53 cents.
+    """
+    totals = np.rint(np.bincount(codes, weights=cents, minlength=size)).astype(np.int64)
+    counts = np.bincount(codes, minlength=size).astype(np.int64)
+    return totals, counts
+
+
+def as_table(data, date_column='date', amount_column='amount', category_column='category'):
+    """
+    Use a TransactionTable as is, or build one from a standard DataFrame
+    """
+    if isinstance(data, TransactionTable):
+        return data
+    return TransactionTable.from_dataframe(data, date_column, amount_column, category_column)
+
+
+class TransactionTable:
+    """
+    Column arrays for a set of transactions
+    """
+    def __init__(self, cents, days, category_codes, categories):
+        self.cents = np.asarray(cents, dtype=np.int64)
+        self.days = np.asarray(days, dtype=np.int32)
+        self.category_codes = np.asarray(category_codes, dtype=np.int32)
+        self.categories = pd.Index(categories, dtype=object)
+
+    def __len__(self):
+        return len(self.cents)
+
+    @classmethod
+    def from_columns(cls, dates, amounts, categories=None):
+        """
+        Build from date, dollar amount and (optional) category columns
+
+        Rows without a date (blank or totals lines) are dropped.
+        """
+        dates = pd.to_datetime(pd.Series(dates))
+        amounts = pd.Series(amounts)
+        valid = dates.notna().to_numpy()
+        if not valid.all():
+            dates, amounts = dates[valid], amounts[valid]
+            if categories is not None:
+                categories = pd.Series(categories)[valid]
+
+        cents = to_cents(pd.to_numeric(amounts, errors='coerce').fillna(0))
+        days = to_day_ordinals(dates)
+
+        if categories is not None:
+            categorical = pd.Categorical(pd.Series(categories).fillna('other').astype(str))
+            codes = categorical.codes
+            names = categorical.categories
+        else:
+            codes = np.zeros(len(cents), dtype=np.int32)
+            names = ['other']
+
+        return cls(cents, days, codes, names)
+
+    @classmethod
+    def from_dataframe(cls, df, date_column='date', amount_column='amount', category_column='category'):
+        """
+        Build from a standard (date, amount, category) DataFrame
+        """
+        categories = df[category_column] if category_column in df.columns else None
+        return cls.from_columns(df[date_column], df[amount_column], categories)
+
+    @classmethod
+    def concat(cls, tables):
+        """
+        Stack tables in order, merging their category dictionaries
+        """
+        if not tables:
+            return cls([], [], [], ['other'])
+        categories = pd.Index([], dtype=object)
+        for table in tables:
+            categories = categories.append(table.categories[~table.categories.isin(categories)])
+
+        codes = [categories.get_indexer(table.categories)[table.category_codes] for table in tables]
+        return cls(np.concatenate([table.cents for table in tables]),
+                   np.concatenate([table.days for table in tables]),
+                   np.concatenate(codes), categories)
+
+    def to_dataframe(self):
+        """
+        Standard (date, amount, category) DataFrame, for pandas-only consumers like plotting
+        """
+        return pd.DataFrame({
+            'date': day_ordinals_to_dates(self.days),
+            'amount': self.cents / 100,
+            'category': np.asarray(self.categories, dtype=object)[self.category_codes]
+        })
+
+    def take(self, selector):
+        """
+        Subset rows by boolean mask or index array (the category dictionary is shared)
+        """
+        return TransactionTable(self.cents[selector], self.days[selector],
+                                self.category_codes[selector], self.categories)
+
+    def category_mask(self, pattern):
+        """
+        Row mask for categories containing pattern (case-insensitive)
+
+        The match runs once per distinct category, not once per row.
+        """
+        matches = self.categories.str.contains(pattern, case=False, na=False, regex=False)
+        return np.asarray(matches, dtype=bool)[self.category_codes]
+
+    def without_payments(self):
+        """
+        Drop payment entries (they're not spending)
+        """
+        return self.take(~self.category_mask('PAYMENT'))
+
+    def sort_by_day(self):
+        """
+        Rows in date order (stable, so same-day rows keep their order)
+        """
+        return self.take(np.argsort(self.days, kind='stable'))
+
+    def drop_duplicates(self, include_category=False):
+        """
+        Drop repeated (day, amount) rows, or (day, amount, category) rows if include_category
+        """
+        columns = [self.days, self.cents]
+        if include_category:
+            columns.append(self.category_codes)
+        keys = np.column_stack(columns).astype(np.int64)
+        _, first = np.unique(keys, axis=0, return_index=True)
+        return self.take(np.sort(first))
+
+    def daily_totals(self):
+        """
+        Spending per day for every day from the first to the last transaction
+
+        Returns:
+            (first day ordinal, int64 array of cents per day, int64 array of counts per day)
+        """
+        if len(self) == 0:
+            return 0, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        first_day = int(self.days.min())
+        offsets = self.days - first_day
+        totals, counts = sum_by(offsets, self.cents, int(offsets.max()) + 1)
+        return first_day, totals, counts
+
+    def monthly_totals(self):
+        """
+        Spending per calendar month from the first to the last transaction
+
+        Returns:
+            (first month ordinal, int64 array of cents per month, int64 array of counts per month)
+        """
+        if len(self) == 0:
+            return 0, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        months = day_ordinals_to_months(self.days)
+        first_month = int(months.min())
+        offsets = months - first_month
+        totals, counts = sum_by(offsets, self.cents, int(offsets.max()) + 1)
+        return first_month, totals, counts
+
+    def category_totals(self):
+        """
+        Spending and transaction count per category
+
+        Returns:
+            DataFrame indexed by category with 'cents' and 'count' columns,
+            only for categories that have transactions
+        """
+        totals, counts = sum_by(self.category_codes, self.cents, len(self.categories))
+        summary = pd.DataFrame({'cents': totals, 'count': counts}, index=self.categories)
+        return summary[summary['count'] > 0]
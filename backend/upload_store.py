@@ -0,0 +1,156 @@
+"""
+Content-addressed storage for uploaded statements
+
+Uploads are hashed (SHA-256) while they stream to disk and stored once under
+their hash, so identical statements share one file across users and uploads.
+Each user has a manifest of the statements they've already ingested and a
+fingerprint of their aggregated history. Forecasts are fitted on that whole
+history, so results are cached under the fingerprint (plus income), and a
+batch's row counts under its file hashes. A byte-identical re-upload is
+answered without parsing, and a row-identical one without folding or
+forecasting again.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from transactions import as_table
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadStore:
+    """
+    Blob storage, per-user manifests and cached results under one root directory
+    """
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.result_dir = os.path.join(root, 'results')
+        self.manifest_dir = os.path.join(root, 'manifests')
+        for directory in (self.blob_dir, self.result_dir, self.manifest_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def save_stream(self, stream):
+        """
+        Hash and store an upload stream, returning (sha256 hex digest, blob path)
+
+        The stream is written to a temp file while hashing; if a blob with the
+        same hash already exists the temp file is discarded.
+        """
+        sha = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    sha.update(chunk)
+                    tmp.write(chunk)
+
+            digest = sha.hexdigest()
+            path = self.blob_path(digest)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            return digest, path
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def batch_key(digests):
+        """
+        Key for a set of statement files (order doesn't matter)
+        """
+        return 'files-' + hashlib.sha256('\n'.join(sorted(digests)).encode()).hexdigest()
+
+    @staticmethod
+    def history_key(fingerprint, monthly_income):
+        """
+        Result key for a forecast of a history fingerprint (SpendingAggregates.fingerprint)
+        """
+        key = f'{fingerprint}\nincome={monthly_income:.2f}'
+        return 'history-' + hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def rows_key(transactions):
+        """
+        Key for a TransactionTable's rows, regardless of file layout
+
+        Identifies a single statement's contents in the user manifest.
+        """
+        table = as_table(transactions)
+        names = np.asarray(table.categories, dtype=object)[table.category_codes]
+        order = np.lexsort((names, table.cents, table.days))
+
+        sha = hashlib.sha256()
+        sha.update(table.days[order].tobytes())
+        sha.update(table.cents[order].tobytes())
+        sha.update('\n'.join(names[order]).encode())
+        return 'rows-' + sha.hexdigest()
+
+    def load_result(self, key):
+        path = os.path.join(self.result_dir, f"{key}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def save_result(self, keys, record):
+        for key in keys:
+            with open(os.path.join(self.result_dir, f"{key}.json"), 'w') as f:
+                json.dump(record, f)
+
+    def _manifest_path(self, user):
+        safe_name = ''.join(c if c.isalnum() or c in '@._-' else '_' for c in user)
+        return os.path.join(self.manifest_dir, f"{safe_name}.json")
+
+    def manifest(self, user):
+        """
+        Statements the user has already ingested, keyed by hash, with an index by rows key
+        """
+        path = self._manifest_path(user)
+        if not os.path.exists(path):
+            return {'statements': {}, 'rows': {}}
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        if 'rows' not in manifest:
+            manifest['rows'] = {entry['rows']: digest for digest, entry in manifest['statements'].items()}
+        return manifest
+
+    @staticmethod
+    def is_known(manifest, digest, rows_key):
+        """
+        Whether a statement is already in the manifest, byte-for-byte or row-for-row
+        """
+        return digest in manifest['statements'] or rows_key in manifest['rows']
+
+    def record_statements(self, user, statements, fingerprint=None):
+        """
+        Add (digest, rows_key, filename) entries to the user's manifest
+
+        fingerprint updates the user's history fingerprint when the statements changed it.
+        """
+        manifest = self.manifest(user)
+        if fingerprint is not None:
+            manifest['history'] = fingerprint
+        uploaded_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for digest, rows_key, filename in statements:
+            manifest['statements'].setdefault(digest, {
+                'filename': filename,
+                'rows': rows_key,
+                'uploaded_at': uploaded_at
+            })
+            manifest['rows'].setdefault(rows_key, digest)
+        with open(self._manifest_path(user), 'w') as f:
+            json.dump(manifest, f, indent=4)
@@ -11,7 +11,8 @@ This combines:
 
 import pandas as pd
 import matplotlib.pyplot as plt
-from finance_forecaster import FinanceForecaster
+from finance_forecaster import FinanceForecaster, COLD_START_DAYS
+from transactions import TransactionTable, as_table, day_ordinals_to_dates
 import json
 from datetime import datetime
 import os
@@ -111,8 +112,8 @@ def main(df, monthly_income=3500):
     Main integration function
     
     Args:
-        df: DataFrame from your partner's PDF extraction
-            Must have columns: 'date', 'amount', (optional: 'category')
+        df: TransactionTable from convert.py, or a DataFrame
+            with columns: 'date', 'amount', (optional: 'category')
         monthly_income: User's monthly income
     
     Returns:
@@ -123,30 +124,37 @@ def main(df, monthly_income=3500):
     print("EARLYSTART FINANCE FORECASTER")
     print("=" * 60)
     
+    has_categories = isinstance(df, TransactionTable) or 'category' in df.columns
+    table = as_table(df)
+    total_spending = table.cents.sum() / 100
+    
     # Display input data summary
     print(f"\n📊 Input Data Summary:")
-    print(f"  Transactions: {len(df)}")
-    print(f"  Date Range: {df['date'].min()} to {df['date'].max()}")
-    print(f"  Total Spending: ${df['amount'].sum():,.2f}")
+    print(f"  Transactions: {len(table)}")
+    if len(table):
+        first, last = day_ordinals_to_dates([table.days.min(), table.days.max()])
+        print(f"  Date Range: {first} to {last}")
+    print(f"  Total Spending: ${total_spending:,.2f}")
     print(f"  Monthly Income: ${monthly_income:,.2f}")
     
-    if 'category' in df.columns:
-        print(f"\n🏷️  Categories found: {df['category'].nunique()}")
-        print(f"  Top category: {df.groupby('category')['amount'].sum().idxmax()}")
+    if has_categories:
+        category_totals = table.category_totals()
+        print(f"\n🏷️  Categories found: {len(category_totals)}")
+        print(f"  Top category: {category_totals['cents'].idxmax()}")
     
     # Run Prophet forecasting
     print("\n" + "=" * 60)
     print("RUNNING PROPHET FORECAST")
     print("=" * 60)
     
-    forecaster = FinanceForecaster()
+    forecaster = FinanceForecaster({'cold_start_days': COLD_START_DAYS})
     
     # Get the internal Prophet forecast for visualization
-    prophet_df = forecaster.prepare_data(df, 'date', 'amount')
+    prophet_df = forecaster.prepare_data(table)
     forecast_df = forecaster.train_and_forecast(prophet_df, periods=52)
     
     # Generate JSON output for Flutter
-    result_json = forecaster.generate_json_output(forecast_df, df, monthly_income)
+    result_json = forecaster.generate_json_output(forecast_df, table if has_categories else None, monthly_income)
     result = json.loads(result_json)
     
     print("✓ Forecast generated successfully!")
@@ -171,6 +179,11 @@ def main(df, monthly_income=3500):
         print(f"\n⚠️  Warning: You may overspend by ${overspend:,.2f}")
         print("💡 Consider reducing expenses!")
     
+    outlook = result.get('savings_outlook')
+    if outlook:
+        print(f"\n🎲 Chance of overspending this year: {outlook['probability_of_overspending'] * 100:.1f}%")
+        print(f"  Likely savings range: ${outlook['savings_percentiles']['p10']:,.2f} to ${outlook['savings_percentiles']['p90']:,.2f}")
+    
     # Category breakdown
     if 'categories' in result:
         print("\n" + "=" * 60)
@@ -182,7 +195,7 @@ def main(df, monthly_income=3500):
             key=lambda x: x[1]['total'],
             reverse=True
         ):
-            percentage = (data['total'] / df['amount'].sum()) * 100
+            percentage = (data['total'] / total_spending) * 100
             print(f"\n{category.upper()}")
             print(f"  Total: ${data['total']:,.2f} ({percentage:.1f}%)")
             print(f"  Avg per transaction: ${data['avg_per_transaction']:.2f}")
@@ -196,7 +209,8 @@ def main(df, monthly_income=3500):
     
     # Create visualization and save to frontend
     plot_path = os.path.join(frontend_dir, 'forecast_plot.png')
-    visualize_forecast(df, forecast_df, monthly_income, output_path=plot_path)
+    # Plotting works on pandas, so the table is only expanded here
+    visualize_forecast(table.to_dataframe(), forecast_df, monthly_income, output_path=plot_path)
     
     # Save JSON to frontend
     json_path = os.path.join(frontend_dir, 'forecast_output.json')
@@ -253,10 +267,10 @@ if __name__ == "__main__":
     print("✓ TEST COMPLETE!")
     print("=" * 60)
     print("\nNow you can integrate with your partner's code:")
-    print("\n  # Import their PDF extractor")
-    print("  from partner_code import extract_pdf_to_dataframe")
-    print("\n  # Get their DataFrame")
-    print("  df = extract_pdf_to_dataframe('statement.pdf')")
+    print("\n  # Import the PDF statement loader")
+    print("  from convert import load_and_process_pdf")
+    print("\n  # Get the transactions")
+    print("  df = load_and_process_pdf('statement.pdf')")
     print("\n  # Run your forecaster")
     print("  results = main(df, monthly_income=3500)")
     print("\n  # Done! Graph + JSON generated")
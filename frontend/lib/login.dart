@@ -44,12 +44,13 @@ class _LoginPageState extends State<LoginPage> {
       );
 
       if (response.statusCode == 200) {
-        // Login success
+        // Login success: the backend requires this session token on uploads
+        final resData = jsonDecode(response.body);
         ScaffoldMessenger.of(context)
             .showSnackBar(const SnackBar(content: Text("Login successful!")));
         Navigator.push(
           context,
-          MaterialPageRoute(builder: (context) => const UploadCSVPage()),
+          MaterialPageRoute(builder: (context) => UploadCSVPage(token: resData['token'])),
         );
       } else {
         // Login failed
@@ -5,7 +5,10 @@ import 'package:hackaton_app/dashboard.dart';
 
 
 class UploadCSVPage extends StatefulWidget {
-  const UploadCSVPage({super.key});
+  const UploadCSVPage({super.key, required this.token});
+
+  // Session token from /login, sent as a bearer token with the upload
+  final String token;
 
 
   @override
@@ -65,6 +68,7 @@ class _UploadCSVPageState extends State<UploadCSVPage> {
   Future<void> _uploadToBackend() async {
     final uri = Uri.parse("http://127.0.0.1:3000/upload");
     final request = http.MultipartRequest('POST', uri);
+    request.headers['Authorization'] = 'Bearer ${widget.token}';
 
 
     for (final file in uploadedFiles) {